@@ -1,8 +1,52 @@
+import time
+from collections import OrderedDict
 from datetime import datetime
+from threading import Lock
+from typing import Optional
 import numpy as np
 import pandas as pd
 from PyUtils import Database
-from Calendar import get_last_day_of_year
+from PyUtils.Calendar import get_last_day_of_year, get_trading_calendar
+
+
+def _is_vector(value) -> bool:
+    """判断是否为 numpy 数组或 pandas Series"""
+    return isinstance(value, (np.ndarray, pd.Series))
+
+
+def _as_array(value) -> np.ndarray:
+    return value.to_numpy() if isinstance(value, pd.Series) else np.asarray(value)
+
+
+def _is_null(value):
+    """逐元素判断空值: None、NaN 或空字符串"""
+    if _is_vector(value):
+        array = _as_array(value)
+        null = pd.isna(array)
+        # object 及 numpy 字符串数组中的空字符串同样视为空值
+        if array.dtype.kind in "OUS":
+            null |= array == ("" if array.dtype.kind != "S" else b"")
+        return null
+    return value is None or (isinstance(value, str) and value == "") or (
+        not isinstance(value, str) and bool(pd.isna(value))
+    )
+
+
+def _truth(value):
+    """逐元素判断条件是否为真: 非空且非0"""
+    if _is_vector(value):
+        array = _as_array(value)
+        null = pd.isna(array)
+        return ~null & (np.where(null, 0, array) != 0)
+    return not _is_null(value) and bool(value)
+
+
+def _like_input(result, *args):
+    """参数中有 Series 时按其索引包装结果"""
+    for arg in args:
+        if isinstance(arg, pd.Series):
+            return pd.Series(result, index=arg.index)
+    return result
 
 
 def IfNULL(indicator1, indicator2):
@@ -10,13 +54,27 @@ def IfNULL(indicator1, indicator2):
     判断指标一是否为空值
 
     参数:
-    indicator1: 需要被判断的指标
-    indicator2: 常数或空值
+    indicator1: 需要被判断的指标, 可以是标量、numpy 数组或 pandas Series
+    indicator2: 常数或空值, 也可以是与指标一等长的数组
 
     返回:
-    min: 所有指标中的最大值
-    """
-    if indicator1 is None or indicator1 == "":
+    指标一为空值(None、NaN 或空字符串)时返回指标二, 否则返回指标一; 数组输入时逐元素计算
+
+    示例:
+    >>> IfNULL("", "z")
+    'z'
+    >>> IfNULL(np.array(["", "a"]), "z")
+    array(['z', 'a'], dtype='<U1')
+    >>> IfNULL(pd.Series(["", "a"]), "z").tolist()
+    ['z', 'a']
+    """
+    if _is_vector(indicator1) or _is_vector(indicator2):
+        value = _as_array(indicator1) if _is_vector(indicator1) else indicator1
+        fill = _as_array(indicator2) if _is_vector(indicator2) else indicator2
+        result = np.where(_is_null(indicator1), fill, value)
+        return _like_input(result, indicator1, indicator2)
+
+    if _is_null(indicator1):
         return indicator2
     else:
         return indicator1
@@ -27,11 +85,11 @@ def Power(indicator, exponent):
     计算指标的乘幂
 
     参数:
-    indicator: 需要计算乘幂的指标
+    indicator: 需要计算乘幂的指标, 可以是标量、numpy 数组或 pandas Series
     exponent: 乘幂指数
 
     返回:
-    result: 指标的乘幂结果
+    result: 指标的乘幂结果, 数组输入时逐元素计算, 空值保持为空
     """
     # 计算指标的乘幂
     result = indicator**exponent
@@ -43,10 +101,10 @@ def abs_value(indicator):
     返回指标的绝对值
 
     参数:
-    indicator: 需要计算绝对值的指标
+    indicator: 需要计算绝对值的指标, 可以是标量、numpy 数组或 pandas Series
 
     返回:
-    abs_indicator: 指标的绝对值
+    abs_indicator: 指标的绝对值, 数组输入时逐元素计算, 空值保持为空
     """
     # 返回指标的绝对值
     abs_indicator = abs(indicator)
@@ -58,11 +116,19 @@ def Not(condition):
     根据条件返回0或1,或者保留空值
 
     参数:
-    condition: 条件表达式或数值指标
+    condition: 条件表达式或数值指标, 可以是标量、numpy 数组或 pandas Series
 
     返回:
-    result: 如果条件为真值(非0数值),返回0;否则返回1;如果条件为空,返回空
+    result: 如果条件为真值(非0数值),返回0;否则返回1;如果条件为空,返回空;
+            数组输入时逐元素计算, 空值位置为NaN
     """
+    if _is_vector(condition):
+        result = np.where(_is_null(condition), np.nan, np.where(_truth(condition), 0, 1))
+        return _like_input(result, condition)
+
+    # 条件为空时保留空值
+    if _is_null(condition):
+        return None
     # 如果条件是真值（非0数值），返回0
     if condition:
         result = 0
@@ -77,18 +143,23 @@ def And(*conditions):
     判断所有输入条件是否都为真(非0)
 
     参数:
-    conditions: 至少两个，最多八个条件表达式或数值指标
+    conditions: 至少两个，最多八个条件表达式或数值指标, 可以是标量、numpy 数组或 pandas Series
 
     返回:
-    result: 如果所有条件都为真(非0),返回1;否则返回0
+    result: 如果所有条件都为真(非0),返回1;否则返回0; 空值视为假; 数组输入时逐元素计算
     """
     # 检查输入条件数量
     if len(conditions) < 2 or len(conditions) > 8:
         raise ValueError("需要至少2个,最多8个输入条件")
 
+    if any(_is_vector(condition) for condition in conditions):
+        truth = [_truth(condition) for condition in conditions]
+        result = np.logical_and.reduce(np.broadcast_arrays(*truth)).astype(int)
+        return _like_input(result, *conditions)
+
     # 检查所有条件是否都为真
     for condition in conditions:
-        if not condition:
+        if not _truth(condition):
             return 0
     return 1
 
@@ -98,18 +169,23 @@ def Or(*conditions):
     判断所有输入条件是否都为真(非0)
 
     参数:
-    conditions: 至少两个，最多八个条件表达式或数值指标
+    conditions: 至少两个，最多八个条件表达式或数值指标, 可以是标量、numpy 数组或 pandas Series
 
     返回:
-    result: 如果至少一个条件为真(非0),返回1;否则返回0
+    result: 如果至少一个条件为真(非0),返回1;否则返回0; 空值视为假; 数组输入时逐元素计算
     """
     # 检查输入条件的数量是否符合要求
     if len(conditions) < 2 or len(conditions) > 8:
         raise ValueError("需要提供2到8个条件")
 
+    if any(_is_vector(condition) for condition in conditions):
+        truth = [_truth(condition) for condition in conditions]
+        result = np.logical_or.reduce(np.broadcast_arrays(*truth)).astype(int)
+        return _like_input(result, *conditions)
+
     # 遍历所有条件，检查是否有任意一个条件为真(非0)
     for condition in conditions:
-        if condition:  # 如果条件为真(非0)
+        if _truth(condition):  # 如果条件为真(非0)
             return 1
 
     # 如果所有条件都为假(0)，则返回0
@@ -121,12 +197,21 @@ def Mod(value, divisor):
     计算除法的余数
 
     参数:
-    value: 被除数
+    value: 被除数, 可以是标量、numpy 数组或 pandas Series
     divisor: 除数，可以是指标或常数
 
     返回:
-    result: 除法的余数
+    result: 除法的余数; 数组输入时逐元素计算, 除数为0或空值的位置为NaN
     """
+    if _is_vector(value) or _is_vector(divisor):
+        dividend = _as_array(value).astype(float)
+        divisor_array = np.asarray(
+            _as_array(divisor) if _is_vector(divisor) else divisor, dtype=float
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            result = np.where(divisor_array == 0, np.nan, np.mod(dividend, divisor_array))
+        return _like_input(result, value, divisor)
+
     try:
         # 计算余数
         result = value % divisor
@@ -137,6 +222,404 @@ def Mod(value, divisor):
         raise ZeroDivisionError("除数不能为0")
 
 
+def load_panel(
+    indicator: str,
+    table: str,
+    tickers: Optional[list] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    date_col: str = "tradeDate",
+    server_name="server93Api",
+) -> pd.DataFrame:
+    """
+    从 mkt_equd 或 fdmt_* 表一次性读取 日期 × 股票 的指标面板
+
+    参数:
+    indicator: 指标名称
+    table: 查询表格名称, 如 mkt_equd、fdmt_is_2018
+    tickers: 股票代码列表, 为None时读取全部股票
+    start: 可选, 起始日期 YYYY-MM-DD
+    end: 可选, 结束日期 YYYY-MM-DD
+    date_col: 日期列名, 行情表为 tradeDate, 财报表为 endDate
+    server_name: 数据库服务器名称,默认为 'server93Api'。
+
+    返回:
+    DataFrame: 以日期为索引、股票代码为列的浮点面板, 财报表同一日期多条记录时取 ID 最大的一条
+    """
+    conditions = []
+    params = {}
+    if tickers is not None:
+        conditions.append("ticker IN :tickers")
+        params["tickers"] = [str(ticker) for ticker in tickers]
+    if start is not None:
+        conditions.append(f"{date_col} >= :start")
+        params["start"] = str(start)
+    if end is not None:
+        conditions.append(f"{date_col} <= :end")
+        params["end"] = str(end)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    # 财报表同一报告期有多次更正, 按 ID 排序使 keep="last" 取到最新一条
+    order = f"ORDER BY {date_col}, ID" if table.startswith("fdmt_") else ""
+    sql = f"SELECT ticker, {date_col}, {indicator} FROM {table} {where} {order}"
+    df = Database.query_pd(server_name, sql, params=params)
+    df[indicator] = pd.to_numeric(df[indicator], errors="coerce")
+    panel = df.drop_duplicates([date_col, "ticker"], keep="last").pivot(
+        index=date_col, columns="ticker", values=indicator
+    )
+    return panel.sort_index()
+
+
+def _as_2d(panel):
+    """将 Series/DataFrame 转为二维浮点数组, 并返回还原为原类型的函数"""
+    if isinstance(panel, pd.Series):
+        values = panel.to_numpy(dtype=float).reshape(-1, 1)
+        return values, lambda out: pd.Series(
+            out[:, 0], index=panel.index, name=panel.name
+        )
+    values = panel.to_numpy(dtype=float)
+    return values, lambda out: pd.DataFrame(
+        out, index=panel.index, columns=panel.columns
+    )
+
+
+def _window_sum(values: np.ndarray, n: int) -> np.ndarray:
+    """用累计和计算每个位置向前n行(含当前行)的窗口和, O(n)"""
+    cumsum = np.zeros((values.shape[0] + 1, values.shape[1]))
+    np.cumsum(values, axis=0, out=cumsum[1:])
+    lower = np.maximum(np.arange(1, values.shape[0] + 1) - n, 0)
+    return cumsum[1:] - cumsum[lower]
+
+
+def rolling_mean(panel, n: int, min_periods: Optional[int] = None):
+    """
+    计算面板每列的滚动均值, 忽略空值
+
+    参数:
+    panel: 日期 × 股票 的 DataFrame, 或单只股票的 Series, 按日期升序
+    n: 窗口长度
+    min_periods: 窗口内最少的非空值个数, 默认为n
+
+    返回:
+    与输入同形状的滚动均值
+    """
+    values, rebuild = _as_2d(panel)
+    min_periods = n if min_periods is None else min_periods
+    valid = ~np.isnan(values)
+    count = _window_sum(valid.astype(float), n)
+    total = _window_sum(np.where(valid, values, 0.0), n)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+    return rebuild(np.where(count >= max(min_periods, 1), mean, np.nan))
+
+
+def rolling_std(panel, n: int, min_periods: Optional[int] = None):
+    """
+    计算面板每列的滚动样本标准差(ddof=1), 忽略空值
+
+    参数:
+    panel: 日期 × 股票 的 DataFrame, 或单只股票的 Series, 按日期升序
+    n: 窗口长度
+    min_periods: 窗口内最少的非空值个数, 默认为n, 至少为2
+
+    返回:
+    与输入同形状的滚动标准差
+    """
+    values, rebuild = _as_2d(panel)
+    min_periods = n if min_periods is None else min_periods
+    valid = ~np.isnan(values)
+    # 先按列去中心化, 减小平方和相减带来的精度损失
+    if valid.any():
+        with np.errstate(invalid="ignore"):
+            center = np.nan_to_num(np.nanmean(values, axis=0))
+    else:
+        center = np.zeros(values.shape[1])
+    centered = np.where(valid, values - center, 0.0)
+    count = _window_sum(valid.astype(float), n)
+    total = _window_sum(centered, n)
+    total_sq = _window_sum(centered**2, n)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        var = (total_sq - total**2 / count) / (count - 1)
+    std = np.sqrt(np.clip(var, 0.0, None))
+    return rebuild(np.where(count >= max(min_periods, 2), std, np.nan))
+
+
+# 滚动排名窗口不超过该天数时逐个滞后期比较, 更长的窗口改用树状数组
+ROLLING_RANK_LAG_LIMIT = 64
+
+
+def rolling_percent_rank(panel, N: int, min_periods: Optional[int] = None):
+    """
+    计算面板每列当前值在过去N个交易日(连同当天共N+1个值)中的排名百分位
+
+    与 PercentRank 一致: 窗口内严格小于当前值的个数除以N, 当前值为空时为NaN。
+    每列的值先按列内排名压缩, 再用树状数组(Fenwick)维护窗口内各排名的个数,
+    逐日加入新值、移出窗口外的值并查询小于当前排名的个数, 所有列同时向量化计算;
+    耗时 O(T·log T), 内存与面板大小相同, 与N无关。
+    N不超过 ROLLING_RANK_LAG_LIMIT 时直接逐个滞后期比较, 耗时 O(T·N)
+
+    参数:
+    panel: 日期 × 股票 的 DataFrame, 或单只股票的 Series, 按日期升序
+    N: 过去N天的天数
+    min_periods: 窗口内最少的非空值个数, 默认为N+1
+
+    返回:
+    与输入同形状的百分位排名
+    """
+    values, rebuild = _as_2d(panel)
+    window = N + 1
+    min_periods = window if min_periods is None else min_periods
+    valid = ~np.isnan(values)
+    count = _window_sum(valid.astype(float), window)
+    n_rows, n_cols = values.shape
+    out = np.full(values.shape, np.nan)
+    if n_rows == 0 or n_cols == 0:
+        return rebuild(out)
+
+    if N <= ROLLING_RANK_LAG_LIMIT:
+        # 窗口较短时逐个滞后期比较更快, 额外内存仍只有一个面板
+        below = np.zeros(values.shape, dtype=np.int64)
+        for lag in range(1, min(N, n_rows - 1) + 1):
+            below[lag:] += values[:-lag] < values[lag:]
+        out = below / N
+        out[~valid | (count < min_periods)] = np.nan
+        return rebuild(out)
+
+    # 列内排名(相同值排名相同), 排名r表示该列中严格小于它的值有r个; 空值排序在最后
+    ordered = np.sort(values, axis=0)
+    ranks = np.empty(values.shape, dtype=np.int64)
+    for j in range(n_cols):
+        ranks[:, j] = np.searchsorted(ordered[:, j], values[:, j], side="left")
+
+    tree = np.zeros((n_rows + 1, n_cols), dtype=np.int64)
+    columns = np.arange(n_cols)
+
+    def update(t, delta):
+        mask = valid[t]
+        pos, cols = ranks[t, mask] + 1, columns[mask]
+        while len(pos):
+            tree[pos, cols] += delta
+            pos = pos + (pos & -pos)
+            keep = pos <= n_rows
+            pos, cols = pos[keep], cols[keep]
+
+    def below(t):
+        keep = ranks[t] > 0
+        pos, cols = ranks[t, keep], columns[keep]
+        total = np.zeros(n_cols, dtype=np.int64)
+        while len(pos):
+            total[cols] += tree[pos, cols]
+            pos = pos - (pos & -pos)
+            keep = pos > 0
+            pos, cols = pos[keep], cols[keep]
+        return total
+
+    for t in range(n_rows):
+        update(t, 1)
+        if t >= window:
+            update(t - window, -1)
+        out[t] = below(t) / N
+    out[~valid | (count < min_periods)] = np.nan
+    return rebuild(out)
+
+
+# 每张财报表在内存中最多缓存的股票数
+FUNDAMENTAL_CACHE_SIZE = 5000
+# 财报缓存有效期(秒), 过期后重新查询以取得新发布的财报
+FUNDAMENTAL_CACHE_TTL = 3600
+
+
+class FundamentalStore:
+    """
+    季度财报数据的共享缓存, 每个 (服务器, 表) 一个实例
+
+    一次查询即可载入多只股票的多个指标, 每个 (股票, 报告期, 报告类型, 发布日期)
+    只保留 ID 最大的一条, 按发布日期可做时点(point-in-time)查询。
+    按股票做 LRU 淘汰, 最多缓存 FUNDAMENTAL_CACHE_SIZE 只股票; 每只股票的数据
+    超过 FUNDAMENTAL_CACHE_TTL 秒后重新查询, 写入该表(Database.write_df 或
+    invalidate_query_cache)时清空
+    """
+
+    _instance = {}
+    _lock = Lock()
+
+    def __new__(cls, table: str, server_name: str = "server93Api"):
+        key = (server_name, table)
+        with cls._lock:
+            if key not in cls._instance:
+                instance = super().__new__(cls)
+                cls._instance[key] = instance
+                instance.table = table
+                instance.server_name = server_name
+                instance.max_tickers = FUNDAMENTAL_CACHE_SIZE
+                instance.max_age = FUNDAMENTAL_CACHE_TTL
+                # ticker -> (已载入的指标集合, DataFrame, 载入时间)
+                instance._frames = OrderedDict()
+                instance._store_lock = Lock()
+        return cls._instance[key]
+
+    def preload(self, tickers: list, indicators: list) -> dict:
+        """
+        一次查询载入多只股票的指标, 已缓存且指标齐全的股票不再查询
+
+        参数:
+        tickers: 股票代码列表
+        indicators: 指标名称列表
+
+        返回:
+        dict: 股票代码 -> 该股票的财报记录
+        """
+        tickers = list(dict.fromkeys(str(ticker) for ticker in tickers))
+        indicators = set(indicators)
+        frames = {}
+        now = time.monotonic()
+        with self._store_lock:
+            missing = []
+            for ticker in tickers:
+                cached = self._frames.get(ticker)
+                if cached is not None and now - cached[2] > self.max_age:
+                    del self._frames[ticker]
+                    cached = None
+                if cached is not None and indicators <= cached[0]:
+                    self._frames.move_to_end(ticker)
+                    frames[ticker] = cached[1]
+                else:
+                    missing.append(ticker)
+                    if cached is not None:
+                        indicators |= cached[0]
+        if not missing:
+            return frames
+
+        df = self._fetch(missing, sorted(indicators))
+        grouped = dict(tuple(df.groupby("ticker", sort=False)))
+        with self._store_lock:
+            for ticker in missing:
+                frames[ticker] = grouped.get(ticker, df.iloc[0:0])
+                self._frames[ticker] = (frozenset(indicators), frames[ticker], now)
+                self._frames.move_to_end(ticker)
+            while len(self._frames) > self.max_tickers:
+                self._frames.popitem(last=False)
+        return frames
+
+    def invalidate(self, tickers: Optional[list] = None):
+        """
+        清除缓存的财报, 下次使用时重新查询
+
+        参数:
+        tickers: 可选, 股票代码列表, 为None时清除全部
+        """
+        with self._store_lock:
+            if tickers is None:
+                self._frames.clear()
+                return
+            for ticker in tickers:
+                self._frames.pop(str(ticker), None)
+
+    def clear(self):
+        """清除全部缓存的财报"""
+        self.invalidate()
+
+    @classmethod
+    def invalidate_table(cls, table: Optional[str] = None):
+        """清除指定表(为None时全部表)在各服务器上的缓存, 作为 Database 的缓存失效回调"""
+        with cls._lock:
+            stores = list(cls._instance.values())
+        for store in stores:
+            if table is None or store.table.split(".")[-1].lower() == table:
+                store.clear()
+
+    def _fetch(self, tickers: list, indicators: list) -> pd.DataFrame:
+        columns = ", ".join(indicators)
+        query = f"""
+        WITH RankedReports AS (
+            SELECT
+                ticker,
+                endDate,
+                publishDate,
+                reportType,
+                ID,
+                {columns},
+                ROW_NUMBER() OVER (
+                    PARTITION BY ticker, endDate, reportType, publishDate ORDER BY ID DESC
+                ) AS rn
+            FROM {self.table}
+            WHERE
+                ticker IN :tickers AND
+                (endDate LIKE '%-03-31' OR endDate LIKE '%-06-30' OR endDate LIKE '%-09-30' OR endDate LIKE '%-12-31')
+        )
+        SELECT *
+        FROM RankedReports
+        WHERE rn = 1
+        """
+        df = Database.query_pd(
+            self.server_name, query, params={"tickers": [str(ticker) for ticker in tickers]}
+        )
+        df["ticker"] = df["ticker"].astype(str)
+        df["endDate"] = pd.to_datetime(df["endDate"])
+        df["publishDate"] = pd.to_datetime(df["publishDate"])
+        return df.drop(columns="rn").sort_values(["endDate", "publishDate", "ID"])
+
+    def reports_panel(self, tickers: list, indicators: list, as_of=None) -> pd.DataFrame:
+        """
+        返回多只股票的全部财报记录
+
+        参数:
+        tickers: 股票代码列表
+        indicators: 指标名称列表
+        as_of: 可选, 只保留发布日期不晚于该日期的记录(发布日期为空的保留)
+
+        返回:
+        DataFrame: 长表, 每只股票内按 endDate, publishDate, ID 升序排列
+        """
+        frames = self.preload(tickers, indicators)
+        frame = pd.concat(list(frames.values())) if frames else pd.DataFrame()
+        if as_of is not None and not frame.empty:
+            publish_date = frame["publishDate"]
+            frame = frame[publish_date.isna() | (publish_date <= pd.Timestamp(as_of))]
+        return frame
+
+    def quarterly_panel(
+        self, tickers: list, indicators: list, as_of=None, start=None, end=None
+    ) -> pd.DataFrame:
+        """
+        返回多只股票每个报告期 ID 最大的一条财报, 与原 ROW_NUMBER() OVER (PARTITION BY endDate) 一致
+
+        参数:
+        tickers: 股票代码列表
+        indicators: 指标名称列表
+        as_of: 可选, 时点日期, 只使用当时已发布的财报
+        start: 可选, 报告期下限(含)
+        end: 可选, 报告期上限(含)
+
+        返回:
+        DataFrame: 长表, 按 ticker 升序、endDate 降序排列
+        """
+        frame = self.reports_panel(tickers, indicators, as_of)
+        if frame.empty:
+            return frame
+        if start is not None:
+            frame = frame[frame["endDate"] >= pd.Timestamp(start)]
+        if end is not None:
+            frame = frame[frame["endDate"] <= pd.Timestamp(end)]
+        latest = frame.sort_values(["ticker", "endDate", "ID"]).drop_duplicates(
+            ["ticker", "endDate"], keep="last"
+        )
+        return latest.sort_values(["ticker", "endDate"], ascending=[True, False])
+
+    def reports(self, ticker: str, indicators: list, as_of=None) -> pd.DataFrame:
+        """返回单只股票的全部财报记录, 参数同 reports_panel"""
+        return self.reports_panel([ticker], indicators, as_of)
+
+    def quarterly(
+        self, ticker: str, indicators: list, as_of=None, start=None, end=None
+    ) -> pd.DataFrame:
+        """返回单只股票每个报告期的最新财报, 按 endDate 降序排列, 参数同 quarterly_panel"""
+        return self.quarterly_panel([ticker], indicators, as_of, start, end)
+
+
+Database.register_cache_invalidation(FundamentalStore.invalidate_table)
+
+
 def Anual(ticker: str, indicator: str, shift_years: int):
     """
     获取指定股票代码和指标的年报数据
@@ -153,22 +636,15 @@ def Anual(ticker: str, indicator: str, shift_years: int):
     target_year = today.year - shift_years - 1
     last_day_of_target_year = get_last_day_of_year(target_year)
 
-    # 构建SQL查询语句
-    sql = f"""
-    SELECT {ticker}, {indicator} 
-    FROM fdmt_is_2018 
-    WHERE endDate = '{last_day_of_target_year.strftime('%Y-%m-%d')}'
-    AND reportType = 'A'
-    AND ticker = '{ticker}'
-    ORDER BY publishDate DESC
-    LIMIT 1
-    """
-    # 使用query_pd函数查询数据
-    df = Database.query_pd("server93Api", sql)
+    df = FundamentalStore("fdmt_is_2018").reports(ticker, [indicator])
+    df = df[
+        (df["endDate"] == pd.Timestamp(last_day_of_target_year))
+        & (df["reportType"] == "A")
+    ]
 
     # 从DataFrame中获取指标值
     if not df.empty:
-        return df.iloc[0][indicator]
+        return df.sort_values("publishDate", kind="stable").iloc[-1][indicator]
     else:
         return None
 
@@ -189,27 +665,109 @@ def PercentRank(ticker, indicator, N):
     sql = f"""
         SELECT {indicator}, tradeDate
         FROM mkt_equd
-        WHERE ticker = '{ticker}'
+        WHERE ticker = :ticker
         ORDER BY tradeDate DESC
         LIMIT {N+1}
     """
 
     # 使用query_pd函数查询数据
-    df = Database.query_pd("server93Api", sql)
+    df = Database.query_pd("server93Api", sql, params={"ticker": ticker})
 
     # 检查DataFrame是否为空
     if df.empty:
         raise ValueError("No data found for the given period and ticker.")
-    # 获取当天的指标数值
-    today_value = df.iloc[0][indicator]
 
-    df["rank"] = df[indicator].rank(ascending=True, method="min") - 1
-    today_rank = df.loc[df.iloc[0].name, "rank"]
-    percent_rank = today_rank / N
-    print(df)
+    series = pd.to_numeric(df[indicator], errors="coerce")[::-1]
+    percent_rank = rolling_percent_rank(series, N, min_periods=1).iloc[-1]
     return percent_rank
 
 
+def _percent_rank_latest(df: pd.DataFrame, indicator: str, N: int) -> pd.Series:
+    """
+    按股票计算最新一期指标在窗口内的排名百分位
+
+    参数:
+    df: 包含 ticker, rn(1为最新一期) 及指标列的长表, 每只股票最多N+1行
+    indicator: 指标名称
+    N: 过去N天的天数
+
+    返回:
+    Series: 以股票代码为索引的百分位排名, 最新一期为空值时为NaN
+    """
+    codes, tickers = pd.factorize(df["ticker"], sort=True)
+    values = pd.to_numeric(df[indicator], errors="coerce").to_numpy(dtype=float)
+    is_latest = df["rn"].to_numpy() == 1
+
+    latest = np.full(len(tickers), np.nan)
+    latest[codes[is_latest]] = values[is_latest]
+    # 与 rank(method="min") - 1 一致: 窗口内严格小于最新值的个数
+    below = np.bincount(codes, weights=values < latest[codes], minlength=len(tickers))
+    percent_rank = np.where(np.isnan(latest), np.nan, below / N)
+    return pd.Series(percent_rank, index=pd.Index(tickers, name="ticker"), name=indicator)
+
+
+# PercentRankBatch 未指定 start 时, 在N个交易日之外多扫描的交易日数, 覆盖短期停牌缺失的行情
+PERCENT_RANK_BUFFER = 60
+
+
+def PercentRankBatch(
+    tickers: Optional[list],
+    indicator: str,
+    N: int,
+    start: Optional[str] = None,
+    server_name="server93Api",
+) -> pd.Series:
+    """
+    批量计算多只股票的指标在过去N个交易日中的排名百分位, 一次查询完成
+
+    参数:
+    tickers: 股票代码列表, 为None时计算全部股票
+    indicator: 指标名称
+    N: 过去N天的天数
+    start: 可选, 只在该日期(YYYY-MM-DD)之后的行情中取窗口, 用于缩小扫描范围;
+           为None时取今天往前 N + PERCENT_RANK_BUFFER 个交易日, 日历无法定位时扫描全部历史
+    server_name: 数据库服务器名称,默认为 'server93Api'。
+
+    返回:
+    Series: 以股票代码为索引的百分位排名, 介于0和1之间
+    """
+    if start is None:
+        try:
+            start = get_trading_calendar().offset(
+                datetime.now().date(), -(N + PERCENT_RANK_BUFFER)
+            ).isoformat()
+        except ValueError:
+            start = None
+    conditions = []
+    params = {}
+    if tickers is not None:
+        conditions.append("ticker IN :tickers")
+        params["tickers"] = [str(ticker) for ticker in tickers]
+    if start is not None:
+        conditions.append("tradeDate >= :start")
+        params["start"] = str(start)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    sql = f"""
+    WITH RankedQuotes AS (
+        SELECT
+            ticker,
+            {indicator},
+            ROW_NUMBER() OVER (PARTITION BY ticker ORDER BY tradeDate DESC) AS rn
+        FROM mkt_equd
+        {where}
+    )
+    SELECT ticker, {indicator}, rn
+    FROM RankedQuotes
+    WHERE rn <= {N+1}
+    """
+    df = Database.query_pd(server_name, sql, params=params)
+    result = _percent_rank_latest(df, indicator, N)
+    if tickers is not None:
+        result = result.reindex(pd.Index(tickers, name="ticker"))
+    return result
+
+
 def refq(indicator, n, fill_option, table, ticker, server_name="server93Api"):
     """
     获取指定股票的财报指标，并根据参数处理空值。
@@ -228,32 +786,10 @@ def refq(indicator, n, fill_option, table, ticker, server_name="server93Api"):
     # 获取当前日期
     current_date = datetime.now().strftime("%Y-%m-%d")
 
-    # 构建SQL查询
-    query = f"""
-    WITH RankedReports AS (
-        SELECT 
-            endDate, 
-            {indicator}, 
-            publishDate,
-            ROW_NUMBER() OVER (PARTITION BY endDate ORDER BY ID DESC) AS rn
-        FROM {table}
-        WHERE 
-            ticker = '{ticker}' AND
-            endDate <= '{current_date}' AND
-            (endDate LIKE '%-03-31' OR endDate LIKE '%-06-30' OR endDate LIKE '%-09-30' OR endDate LIKE '%-12-31')
+    df = FundamentalStore(table, server_name).quarterly(
+        ticker, [indicator], end=current_date
     )
-    SELECT *
-    FROM RankedReports
-    WHERE rn = 1
-    ORDER BY endDate DESC
-    LIMIT {n+1}
-    """
-    # 使用query_pd函数查询数据
-    df = Database.query_pd(server_name, query)
-    print(df)
-    # 确保endDate和publishDate是datetime类型
-    df["endDate"] = pd.to_datetime(df["endDate"])
-    df["publishDate"] = pd.to_datetime(df["publishDate"])
+    df = df.head(n + 1)
 
     # 初始化结果变量
     result = None
@@ -263,7 +799,8 @@ def refq(indicator, n, fill_option, table, ticker, server_name="server93Api"):
         result = df.iloc[-1][indicator]
 
     # 处理空值
-    if result is None:
+    if result is None or pd.isna(result):
+        result = None
         if fill_option == 0:
             # 往前找4个季度补全空值
             for i in range(min(len(df), 4)):
@@ -294,32 +831,15 @@ def Stdev(indicator, n, table, ticker, server_name="server93Api"):
     # 获取当前日期
     current_date = datetime.now().strftime("%Y-%m-%d")
 
-    # 构建SQL查询
-    query = f"""
-    WITH RankedReports AS (
-        SELECT 
-            endDate, 
-            {indicator}, 
-            publishDate,
-            ROW_NUMBER() OVER (PARTITION BY endDate ORDER BY ID DESC) AS rn
-        FROM {table}
-        WHERE 
-            ticker = '{ticker}' AND
-            endDate <= '{current_date}' AND
-            (endDate LIKE '%-03-31' OR endDate LIKE '%-06-30' OR endDate LIKE '%-09-30' OR endDate LIKE '%-12-31')
+    df = FundamentalStore(table, server_name).quarterly(
+        ticker, [indicator], end=current_date
     )
-    SELECT *
-    FROM RankedReports
-    WHERE rn = 1
-    ORDER BY endDate DESC
-    LIMIT {n}
-    """
-    # 使用query_pd函数查询数据
-    df = Database.query_pd(server_name, query)
-    print(df)
+    df = df.head(n)
+    if df.empty:
+        return np.nan
 
-    df[indicator] = df[indicator].astype(float)
-    stdev = df[indicator].std()
+    series = df[indicator].astype(float)[::-1]
+    stdev = rolling_std(series, n, min_periods=2).iloc[-1]
 
     return stdev
 
@@ -346,28 +866,10 @@ def AccuQ(indicator, n, table, ticker, server_name="server93Api"):
     else:
         start = datetime(current_date.year - n, 1, 1).strftime("%Y-%m-%d")
         end = datetime(current_date.year - n, 12, 31).strftime("%Y-%m-%d")
-    # 构建SQL查询
-    query = f"""
-    WITH RankedReports AS (
-        SELECT 
-            endDate, 
-            {indicator}, 
-            publishDate,
-            ROW_NUMBER() OVER (PARTITION BY endDate ORDER BY ID DESC) AS rn
-        FROM {table}
-        WHERE 
-            ticker = '{ticker}' AND
-            endDate <= '{end}' AND
-            endDate >= '{start}' AND
-            (endDate LIKE '%-03-31' OR endDate LIKE '%-06-30' OR endDate LIKE '%-09-30' OR endDate LIKE '%-12-31')
+
+    df = FundamentalStore(table, server_name).quarterly(
+        ticker, [indicator], start=start, end=end
     )
-    SELECT *
-    FROM RankedReports
-    WHERE rn = 1
-    ORDER BY endDate DESC
-    """
-    # 使用query_pd函数查询数据
-    df = Database.query_pd(server_name, query)
     result = df.iloc[0][indicator]
     return result
 
@@ -392,21 +894,22 @@ def LastValue(
     指定条件的指标值
     """
     condition_clauses = []
-    for condition in conditions:
+    params = {"ticker": ticker}
+    for i, condition in enumerate(conditions):
         col, op, val = condition.split()
-        val = float(val)  # 将值转换为浮点数
-        condition_clauses.append(f"{col} {op} {val}")
+        params[f"v{i}"] = float(val)  # 将值转换为浮点数
+        condition_clauses.append(f"{col} {op} :v{i}")
 
     query = f"""
     SELECT {indicator}
     FROM {table}
-    WHERE ticker = {ticker}
+    WHERE ticker = :ticker
       AND {' AND '.join(condition_clauses)}
     ORDER BY tradeDate DESC
     LIMIT 1
     """
     # 使用query_pd函数查询数据
-    df = Database.query_pd(server_name, query)
+    df = Database.query_pd(server_name, query, params=params)
     # 获取指标值
     if not df.empty:
         last_value = df.iloc[0][indicator]
@@ -434,25 +937,35 @@ def MA(indicator, n, table, ticker, server_name="server93Api"):
         query = f"""
         SELECT {indicator}
         FROM {table}
-        WHERE ticker = '{ticker}'
-        AND tradingDate <= '{current_day}'
+        WHERE ticker = :ticker
+        AND tradingDate <= :current_day
         ORDER BY tradingDate DESC
         """
-        df = Database.query_pd(server_name, query)
+        df = Database.query_pd(
+            server_name, query, params={"ticker": ticker, "current_day": current_day}
+        )
+        if df.empty:
+            return np.nan
 
-        mva = np.mean(df[indicator])
+        series = pd.to_numeric(df[indicator], errors="coerce")[::-1]
+        mva = rolling_mean(series, len(series), min_periods=1).iloc[-1]
 
         return mva
     else:
         query = f"""
         SELECT {indicator},tradeDate
         FROM {table}
-        WHERE ticker = '{ticker}'
-        AND tradeDate < '{current_day}'
+        WHERE ticker = :ticker
+        AND tradeDate < :current_day
         ORDER BY tradeDate DESC
         LIMIT {n}
         """
-        df = Database.query_pd(server_name, query)
-        mva = np.mean(df[indicator])
-        print(df)
+        df = Database.query_pd(
+            server_name, query, params={"ticker": ticker, "current_day": current_day}
+        )
+        if df.empty:
+            return np.nan
+
+        series = pd.to_numeric(df[indicator], errors="coerce")[::-1]
+        mva = rolling_mean(series, n, min_periods=1).iloc[-1]
         return mva
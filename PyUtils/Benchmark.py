@@ -0,0 +1,340 @@
+# 性能基准模块
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from PyUtils import Algorithm, Calendar, Database, Fixture, Formula
+
+BENCHMARK_DIR = os.path.join(
+    os.environ.get(
+        "PYUTILS_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "PyUtils")
+    ),
+    "benchmark",
+)
+# 与基准相比耗时或峰值内存增加超过该比例即视为退化
+REGRESSION_THRESHOLD = 0.2
+
+
+class _Case:
+    """
+    一个基准用例
+
+    参数:
+    name: 用例名称, 同时作为结果和基准比较的键
+    func: 被测函数, 无参数
+    repeat: 计时次数, 取中位数
+    items: 每次调用处理的条目数(股票数、日期数或行数), 用于计算吞吐量
+    setup: 可选, 每次计时前调用, 不计入耗时(如清空缓存)
+    """
+
+    def __init__(self, name: str, func, repeat: int = 20, items=None, setup=None):
+        self.name = name
+        self.func = func
+        self.repeat = repeat
+        self.items = items
+        self.setup = setup
+
+    def run(self) -> dict:
+        if self.setup is not None:
+            self.setup()
+        self.func()  # 预热
+
+        times = []
+        for _ in range(self.repeat):
+            if self.setup is not None:
+                self.setup()
+            start = time.perf_counter()
+            self.func()
+            times.append(time.perf_counter() - start)
+
+        if self.setup is not None:
+            self.setup()
+        tracemalloc.start()
+        try:
+            self.func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        times = np.array(times)
+        result = {
+            "seconds": float(np.median(times)),
+            "min": float(times.min()),
+            "p95": float(np.percentile(times, 95)),
+            "repeat": self.repeat,
+            "peak_bytes": int(peak),
+        }
+        if self.items:
+            result["items"] = self.items
+            result["items_per_second"] = self.items / result["seconds"]
+        return result
+
+
+def prepare_fixture(workdir: str, n_tickers: int, days: int, seed: int = 0) -> str:
+    """
+    生成(或复用)基准测试用的本地数据库, 并令 Database 使用该库
+
+    参数:
+    workdir: 工作目录
+    n_tickers: 股票数量
+    days: 行情自然日天数
+    seed: 随机数种子
+
+    返回:
+    str: 配置文件路径
+    """
+    os.makedirs(workdir, exist_ok=True)
+    path = os.path.join(workdir, "fixture.db")
+    clickhouse_path = os.path.join(workdir, "clickhouse_{database}.db")
+    config_path = os.path.join(workdir, "config.yaml")
+    meta_path = os.path.join(workdir, "fixture.json")
+    end = pd.Timestamp.today().normalize()
+    meta = {"n_tickers": n_tickers, "days": days, "seed": seed, "end": end.strftime("%Y-%m-%d")}
+
+    try:
+        with open(meta_path, encoding="utf-8") as file:
+            current = json.load(file) == meta
+    except (OSError, ValueError):
+        current = False
+    if not current or not os.path.exists(path):
+        print(f"生成测试数据: {n_tickers} 只股票, {days} 天")
+        Fixture.generate_fixture(
+            path,
+            n_tickers=n_tickers,
+            start=end - pd.Timedelta(days=days),
+            end=end,
+            seed=seed,
+            clickhouse_path=clickhouse_path,
+        )
+        with open(meta_path, "w", encoding="utf-8") as file:
+            json.dump(meta, file)
+    Fixture.write_fixture_config(config_path, path, clickhouse_path=clickhouse_path)
+
+    os.environ["PYUTILS_CONFIG"] = config_path
+    Database.load_config.cache_clear()
+    Calendar.CALENDAR_SNAPSHOT_DIR = workdir
+    return config_path
+
+
+def _reset_stores():
+    Algorithm.FundamentalStore._instance.clear()
+
+
+def _reset_calendar():
+    Calendar.TradingCalendar._instance.clear()
+
+
+def build_cases(sizes: list, quick: bool = False) -> list:
+    """
+    构建基准用例: 单次调用延迟、不同股票数量下的批量吞吐、DataFrame 构建
+
+    参数:
+    sizes: 批量用例的股票数量列表, 如 [1000, 10000]
+    quick: 为 True 时减少计时次数
+    """
+    repeat = 5 if quick else 20
+    batch_repeat = 2 if quick else 5
+    universe = Database.query_pd(
+        "server93Api", "SELECT DISTINCT ticker FROM mkt_equd ORDER BY ticker"
+    )["ticker"].tolist()
+    span = Database.query_pd(
+        "server93Api", "SELECT MIN(tradeDate) AS first, MAX(tradeDate) AS last FROM mkt_equd"
+    )
+    first_day, last_day = str(span["first"][0]), str(span["last"][0])
+    dates = Calendar.get_trading_calendar().trading_days_between(first_day, last_day)
+    month_ago = (pd.Timestamp(last_day) - pd.Timedelta(days=30)).strftime("%Y%m%d")
+    ticker = universe[0]
+
+    cases = [
+        # 单次调用延迟
+        _Case("calendar.load", lambda: Calendar.get_trading_calendar().is_open(last_day),
+              repeat, setup=_reset_calendar),
+        _Case("calendar.is_trading_day", lambda: Calendar.is_trading_day(last_day), repeat * 50),
+        _Case("algorithm.PercentRank", lambda: Algorithm.PercentRank(ticker, "closePrice", 20),
+              repeat),
+        _Case("algorithm.refq.cold",
+              lambda: Algorithm.refq("revenue", 1, 1, "fdmt_is_2018", ticker),
+              repeat, setup=_reset_stores),
+        _Case("algorithm.refq.warm",
+              lambda: Algorithm.refq("revenue", 1, 1, "fdmt_is_2018", ticker), repeat),
+        _Case("database.query_pd.point",
+              lambda: Database.query_pd(
+                  "server93Api",
+                  "SELECT closePrice FROM mkt_equd WHERE ticker = :ticker AND tradeDate = :date",
+                  params={"ticker": ticker, "date": last_day},
+              ), repeat),
+        _Case("database.get_df.month",
+              lambda: Database.get_df("datayes", "stock_daily", month_ago,
+                                      last_day.replace("-", "")), repeat),
+    ]
+
+    for size in sizes:
+        tickers = universe[:size]
+        if len(tickers) < size:
+            print(f"测试库只有 {len(tickers)} 只股票, 跳过 {size} 只股票的批量用例")
+            continue
+        cases += [
+            _Case(f"calendar.batch_is_trading_day.{size}",
+                  lambda n=size: Calendar.batch_is_trading_day(
+                      np.resize(np.asarray(dates, dtype="datetime64[D]"), n)),
+                  repeat, items=size),
+            _Case(f"algorithm.PercentRankBatch.{size}",
+                  lambda t=tickers: Algorithm.PercentRankBatch(t, "closePrice", 20),
+                  batch_repeat, items=size),
+            _Case(f"formula.refq.{size}",
+                  lambda t=tickers: Formula.evaluate_formula(
+                      'refq("revenue", 1, 1, "fdmt_is_2018")', t),
+                  batch_repeat, items=size, setup=_reset_stores),
+            _Case(f"database.query_pd.panel.{size}",
+                  lambda t=tickers: Database.query_pd(
+                      "server93Api",
+                      "SELECT ticker, tradeDate, closePrice FROM mkt_equd WHERE ticker IN :tickers",
+                      params={"tickers": t},
+                  ), batch_repeat, items=size),
+            _Case(f"database.query_pd.panel.columnar.{size}",
+                  lambda t=tickers: Database.query_pd(
+                      "server93Api",
+                      "SELECT ticker, tradeDate, closePrice FROM mkt_equd WHERE ticker IN :tickers",
+                      params={"tickers": t},
+                      columnar=True,
+                  ), batch_repeat, items=size),
+        ]
+
+    # DataFrame 构建, 不含查询
+    result = Database.query("server93Api", "SELECT * FROM mkt_equd LIMIT 200000")
+    names = list(result.keys())
+    rows = result.fetchall()
+    columns = [list(column) for column in zip(*rows)]
+    quarter_ago = (pd.Timestamp(last_day) - pd.Timedelta(days=90)).strftime("%Y%m%d")
+    cases += [
+        _Case("frame.from_rows", lambda: pd.DataFrame(rows, columns=names), batch_repeat,
+              items=len(rows)),
+        _Case("frame.from_columns", lambda: Database.frame_from_columns(columns, names),
+              batch_repeat, items=len(rows)),
+        _Case("database.get_df.quarter",
+              lambda: Database.get_df("datayes", "stock_daily", quarter_ago,
+                                      last_day.replace("-", "")), batch_repeat),
+    ]
+    return cases
+
+
+def run_benchmarks(cases: list, only=None) -> dict:
+    """
+    运行基准用例
+
+    参数:
+    cases: build_cases 返回的用例列表
+    only: 可选, 只运行名称包含该字符串的用例
+
+    返回:
+    dict: {"meta": 运行环境, "results": {用例名: 结果}}
+    """
+    results = {}
+    for case in cases:
+        if only and only not in case.name:
+            continue
+        result = case.run()
+        results[case.name] = result
+        print(_format_result(case.name, result))
+    return {
+        "meta": {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+        },
+        "results": results,
+    }
+
+
+def _format_result(name: str, result: dict) -> str:
+    text = (
+        f"{name:<45} {result['seconds'] * 1000:>10.3f} ms"
+        f"  p95 {result['p95'] * 1000:>10.3f} ms"
+        f"  峰值 {result['peak_bytes'] / 1024**2:>8.2f} MB"
+    )
+    if "items_per_second" in result:
+        text += f"  {result['items_per_second']:>12.0f} 条/秒"
+    return text
+
+
+def compare(current: dict, baseline: dict, threshold: float = REGRESSION_THRESHOLD) -> list:
+    """
+    与基准结果比较
+
+    参数:
+    current: 本次结果
+    baseline: 基准结果
+    threshold: 退化阈值, 耗时或峰值内存超过基准的 (1 + threshold) 倍即视为退化
+
+    返回:
+    list: [(用例名, 指标, 基准值, 本次值, 比例), ...] 退化的用例
+    """
+    regressions = []
+    for name, result in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        for metric in ("seconds", "peak_bytes"):
+            if not base.get(metric):
+                continue
+            ratio = result[metric] / base[metric]
+            if ratio > 1 + threshold:
+                regressions.append((name, metric, base[metric], result[metric], ratio))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="PyUtils 性能基准")
+    parser.add_argument("--workdir", default=BENCHMARK_DIR, help="测试数据和结果目录")
+    parser.add_argument("--sizes", default="1000,10000", help="批量用例的股票数量, 逗号分隔")
+    parser.add_argument("--days", type=int, default=365, help="测试数据的自然日天数")
+    parser.add_argument("--only", help="只运行名称包含该字符串的用例")
+    parser.add_argument("--quick", action="store_true", help="减少计时次数")
+    parser.add_argument("--output", help="结果 JSON 路径, 默认写入工作目录")
+    parser.add_argument("--baseline", help="基准结果 JSON 路径, 默认为工作目录下的 baseline.json")
+    parser.add_argument("--save-baseline", action="store_true", help="将本次结果保存为基准")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    prepare_fixture(args.workdir, max(sizes), args.days)
+    report = run_benchmarks(build_cases(sizes, args.quick), args.only)
+    report["meta"]["sizes"] = sizes
+
+    output = args.output or os.path.join(
+        args.workdir, f"results-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2, ensure_ascii=False)
+    print(f"结果已写入 {output}")
+
+    baseline_path = args.baseline or os.path.join(args.workdir, "baseline.json")
+    if args.save_baseline:
+        with open(baseline_path, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+        print(f"基准已保存到 {baseline_path}")
+        return 0
+    if not os.path.exists(baseline_path):
+        print("未找到基准结果, 使用 --save-baseline 保存")
+        return 0
+
+    with open(baseline_path, encoding="utf-8") as file:
+        baseline = json.load(file)
+    regressions = compare(report, baseline, args.threshold)
+    for name, metric, base, value, ratio in regressions:
+        print(f"退化: {name} {metric} {base:.6g} -> {value:.6g} ({ratio:.2f}x)")
+    if not regressions:
+        print("与基准相比无退化")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,14 @@
-from datetime import datetime, timedelta, time
+import os
+import logging
+from datetime import datetime, timedelta, time, date as date_type
+from threading import Lock, get_ident
+import numpy as np
 import pandas as pd
 from PyUtils import Database
 from typing import Optional, Literal
 
+logger = logging.getLogger(__name__)
+
 
 def is_valid_date(date_str) -> bool:
     """判断输入的字符串格式是否为%Y-%m-%d"""
@@ -27,6 +33,450 @@ def get_last_friday(date_str) -> str:
     return last_friday.strftime("%Y-%m-%d")
 
 
+class TradingCalendar:
+    """
+    交易日历索引, 按交易所一次性加载 trade_cal 并常驻内存
+
+    日期以排序后的数组保存, 并维护 日期 -> 下标 的字典,
+    判断是否开市、前后交易日、前后第N个交易日均为 O(1), 不再访问数据库
+    """
+
+    _instance = {}
+    _lock = Lock()
+
+    def __new__(cls, exchange_cd: str = "XSHG", server_name: str = "server93Api"):
+        key = (exchange_cd, server_name)
+        with cls._lock:
+            if key not in cls._instance:
+                instance = super().__new__(cls)
+                cls._instance[key] = instance
+                instance.exchange_cd = exchange_cd
+                instance.server_name = server_name
+                instance._loaded = False
+                instance._load_lock = Lock()
+        return cls._instance[key]
+
+    def load(self, force_refresh: bool = False):
+        """
+        加载该交易所的全部日历
+
+        本地快照新鲜时直接内存映射读取, 否则从 trade_cal 增量刷新快照;
+        force_refresh 为 True 时重新拉取全部记录
+        """
+        snapshot = (
+            None
+            if force_refresh
+            else load_calendar_snapshot(self.exchange_cd, server_name=self.server_name)
+        )
+        if snapshot is None:
+            snapshot = refresh_calendar_snapshot(
+                self.exchange_cd, self.server_name, full=force_refresh
+            )
+        self._build(snapshot["calendarDate"], snapshot["isOpen"])
+
+    def refresh(self):
+        """重新加载日历, 用于日历表更新之后"""
+        with self._load_lock:
+            self.load(force_refresh=True)
+            self._loaded = True
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            with self._load_lock:
+                if not self._loaded:
+                    self.load()
+                    self._loaded = True
+
+    def _build(self, dates, is_open):
+        """由日期列和开市标志列构建索引"""
+        if getattr(dates, "dtype", None) != np.dtype("datetime64[D]"):
+            dates = pd.to_datetime(pd.Series(dates)).to_numpy().astype("datetime64[D]")
+        is_open = np.asarray(is_open, dtype=bool)
+        # 快照已按日期排序, 此时直接使用内存映射的数组, 不做拷贝
+        if len(dates) > 1 and not (dates[1:] > dates[:-1]).all():
+            order = np.argsort(dates, kind="stable")
+            dates, is_open = dates[order], is_open[order]
+        self._dates = dates
+        self._is_open = is_open
+        # _cum_open[i]: 截至第i个日历日(含)的交易日数量
+        self._cum_open = np.cumsum(self._is_open)
+        self._trading_days = self._dates[self._is_open]
+        self._trading_list = self._trading_days.astype(object).tolist()
+        self._pos = {
+            d.isoformat(): i for i, d in enumerate(self._dates.astype(object).tolist())
+        }
+
+    @staticmethod
+    def _date_key(date) -> str:
+        """将日期统一转换为 YYYY-MM-DD 字符串"""
+        if isinstance(date, str):
+            if len(date) == 10:
+                return date
+            # 如 "2024-1-5", 补齐为 "2024-01-05"
+            return datetime.strptime(date, "%Y-%m-%d").date().isoformat()
+        if isinstance(date, datetime):
+            return date.date().isoformat()
+        if isinstance(date, date_type):
+            return date.isoformat()
+        return str(np.datetime64(date, "D"))
+
+    def _index(self, date) -> int:
+        self._ensure_loaded()
+        try:
+            return self._pos[self._date_key(date)]
+        except KeyError:
+            raise ValueError(f"日期 {date} 不在交易日历范围内")
+
+    def _trading_day_at(self, pos: int, date) -> date_type:
+        if not 0 <= pos < len(self._trading_list):
+            raise ValueError(f"日期 {date} 的偏移超出交易日历范围")
+        return self._trading_list[pos]
+
+    def is_open(self, date) -> bool:
+        """判断是否为交易日"""
+        i = self._index(date)
+        return bool(self._is_open[i])
+
+    def prev(self, date) -> date_type:
+        """返回给定日期之前(不含当天)的最近一个交易日"""
+        i = self._index(date)
+        return self._trading_day_at(self._cum_open[i] - self._is_open[i] - 1, date)
+
+    def next(self, date) -> date_type:
+        """返回给定日期之后(不含当天)的最近一个交易日"""
+        i = self._index(date)
+        return self._trading_day_at(self._cum_open[i], date)
+
+    def offset(self, date, n: int) -> date_type:
+        """
+        返回相对给定日期偏移n个交易日的日期
+
+        参数:
+        date: 日期, 字符串 YYYY-MM-DD 或 date/datetime
+        n: 偏移的交易日数, 正数向后, 负数向前;
+           n为0时, 交易日返回自身, 非交易日返回前一个交易日
+
+        返回:
+        date: 偏移后的交易日
+        """
+        i = self._index(date)
+        if self._is_open[i] or n >= 0:
+            pos = self._cum_open[i] - 1 + n
+        else:
+            pos = self._cum_open[i] + n
+        return self._trading_day_at(pos, date)
+
+    def trading_days_between(self, start, end) -> np.ndarray:
+        """返回闭区间 [start, end] 内的交易日, datetime64[D] 数组"""
+        self._ensure_loaded()
+        lo = np.searchsorted(self._trading_days, np.datetime64(start, "D"), side="left")
+        hi = np.searchsorted(self._trading_days, np.datetime64(end, "D"), side="right")
+        return self._trading_days[lo:hi]
+
+    def _locate(self, days: np.ndarray):
+        """
+        用 searchsorted 批量定位日期
+
+        返回:
+        k: 小于等于该日期的交易日数量
+        is_open: 是否为交易日
+        in_range: 是否在日历范围内(NaT 视为不在范围内)
+        """
+        self._ensure_loaded()
+        in_range = ~np.isnat(days)
+        in_range[in_range] = (days[in_range] >= self._dates[0]) & (
+            days[in_range] <= self._dates[-1]
+        )
+        k = np.searchsorted(self._trading_days, days, side="right")
+        last = self._trading_days[np.maximum(k - 1, 0)]
+        is_open = in_range & (k > 0) & (last == days)
+        return k, is_open, in_range
+
+    def _take(self, pos: np.ndarray, valid: np.ndarray) -> np.ndarray:
+        """按交易日下标取值, 越界或无效位置返回 NaT"""
+        valid = valid & (pos >= 0) & (pos < len(self._trading_days))
+        out = np.full(pos.shape, np.datetime64("NaT"), dtype="datetime64[D]")
+        out[valid] = self._trading_days[pos[valid]]
+        return out
+
+    def is_open_batch(self, dates):
+        """批量判断是否为交易日, 返回布尔数组"""
+        days = _to_day_array(dates)
+        _, is_open, _ = self._locate(days)
+        return _wrap_like(is_open, dates)
+
+    def prev_batch(self, dates):
+        """批量返回给定日期之前(不含当天)的最近一个交易日"""
+        days = _to_day_array(dates)
+        k, is_open, in_range = self._locate(days)
+        return _wrap_like(self._take(k - is_open - 1, in_range), dates)
+
+    def next_batch(self, dates):
+        """批量返回给定日期之后(不含当天)的最近一个交易日"""
+        days = _to_day_array(dates)
+        k, _, in_range = self._locate(days)
+        return _wrap_like(self._take(k, in_range), dates)
+
+    def offset_batch(self, dates, n: int):
+        """
+        批量返回相对给定日期偏移n个交易日的日期, 规则与 offset 相同
+
+        参数:
+        dates: datetime64 数组、pandas Series 或日期字符串列表
+        n: 偏移的交易日数
+
+        返回:
+        datetime64[D] 数组(输入为 Series 时返回 Series), 越界位置为 NaT
+        """
+        days = _to_day_array(dates)
+        k, is_open, in_range = self._locate(days)
+        pos = np.where(is_open | (n >= 0), k - 1 + n, k + n)
+        return _wrap_like(self._take(pos, in_range), dates)
+
+    def period_bound_batch(
+        self,
+        dates,
+        period: Literal["week", "month", "quarter", "year"],
+        how: Literal["end", "start"] = "end",
+    ):
+        """
+        批量返回给定日期所在周期的最后(或第一个)交易日
+
+        参数:
+        dates: datetime64 数组、pandas Series 或日期字符串列表
+        period: 周期, 可选 week/month/quarter/year
+        how: end 返回周期内最后一个交易日, start 返回第一个交易日
+
+        返回:
+        datetime64[D] 数组(输入为 Series 时返回 Series), 周期内无交易日时为 NaT
+        """
+        self._ensure_loaded()
+        days = _to_day_array(dates)
+        trading_keys = _period_key(self._trading_days, period)
+        if how == "end":
+            bound = np.r_[trading_keys[1:] != trading_keys[:-1], True]
+        else:
+            bound = np.r_[True, trading_keys[1:] != trading_keys[:-1]]
+        bound_keys = trading_keys[bound]
+        bound_days = self._trading_days[bound]
+
+        valid = ~np.isnat(days)
+        keys = _period_key(days, period)
+        idx = np.searchsorted(bound_keys, keys)
+        idx_clip = np.minimum(idx, len(bound_keys) - 1)
+        valid &= (idx < len(bound_keys)) & (bound_keys[idx_clip] == keys)
+        out = np.full(days.shape, np.datetime64("NaT"), dtype="datetime64[D]")
+        out[valid] = bound_days[idx_clip[valid]]
+        return _wrap_like(out, dates)
+
+
+def _to_day_array(dates) -> np.ndarray:
+    """将日期序列转换为 datetime64[D] 数组"""
+    values = dates.to_numpy() if isinstance(dates, pd.Series) else np.asarray(dates)
+    if values.dtype.kind != "M":
+        values = pd.to_datetime(values.ravel()).to_numpy().reshape(values.shape)
+    return values.astype("datetime64[D]")
+
+
+def _wrap_like(values: np.ndarray, dates):
+    """输入为 Series 时, 按原索引包装结果"""
+    if isinstance(dates, pd.Series):
+        return pd.Series(values, index=dates.index, name=dates.name)
+    return values
+
+
+def _period_key(days: np.ndarray, period: str) -> np.ndarray:
+    """计算日期所属周期的整数编号"""
+    if period == "week":
+        # 1970-01-01 为周四, 加3后按7整除得到以周一为起点的周编号
+        return (days.astype("int64") + 3) // 7
+    if period == "month":
+        return days.astype("datetime64[M]").astype("int64")
+    if period == "quarter":
+        return days.astype("datetime64[M]").astype("int64") // 3
+    if period == "year":
+        return days.astype("datetime64[Y]").astype("int64")
+    raise ValueError(f"不支持的周期: {period}")
+
+
+# 交易日历快照目录, 可通过环境变量 PYUTILS_CACHE_DIR 指定
+CALENDAR_SNAPSHOT_DIR = os.environ.get(
+    "PYUTILS_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "PyUtils")
+)
+# 快照超过该时长未刷新即视为过期
+CALENDAR_SNAPSHOT_MAX_AGE = timedelta(days=1)
+# 增量刷新时重新拉取今天往前该天数及之后的记录, 覆盖节假日调整等对已有记录的修改
+CALENDAR_REFRESH_WINDOW = timedelta(days=30)
+
+_SNAPSHOT_DTYPE = np.dtype([("calendarDate", "datetime64[D]"), ("isOpen", "?")])
+
+
+def calendar_snapshot_path(exchange_cd: str = "XSHG", server_name: str = "server93Api") -> str:
+    """返回交易日历快照文件路径, 每个 (服务器, 交易所) 一个文件"""
+    return os.path.join(CALENDAR_SNAPSHOT_DIR, f"trade_cal_{server_name}_{exchange_cd}.npy")
+
+
+def load_calendar_snapshot(
+    exchange_cd: str = "XSHG",
+    max_age: Optional[timedelta] = None,
+    server_name: str = "server93Api",
+) -> Optional[np.ndarray]:
+    """
+    以内存映射方式读取本地交易日历快照
+
+    参数:
+    exchange_cd: 交易所代码
+    max_age: 快照最长有效期, 默认为 CALENDAR_SNAPSHOT_MAX_AGE, 传入 timedelta.max 表示不检查
+    server_name: 数据库服务器名称,默认为 'server93Api'。
+
+    返回:
+    结构化数组(calendarDate, isOpen), 快照不存在或已过期时返回 None
+    """
+    path = calendar_snapshot_path(exchange_cd, server_name)
+    if not os.path.exists(path):
+        return None
+    max_age = max_age if max_age is not None else CALENDAR_SNAPSHOT_MAX_AGE
+    age = datetime.now() - datetime.fromtimestamp(os.path.getmtime(path))
+    if age > max_age:
+        return None
+    return np.load(path, mmap_mode="r")
+
+
+def refresh_calendar_snapshot(
+    exchange_cd: str = "XSHG", server_name: str = "server93Api", full: bool = False
+) -> np.ndarray:
+    """
+    从 trade_cal 增量刷新本地交易日历快照
+
+    重新拉取今天往前 CALENDAR_REFRESH_WINDOW 及之后(含未来)的记录并覆盖快照中对应的行,
+    更早的记录沿用快照; 数据库不可用但本地已有快照时, 沿用旧快照
+
+    参数:
+    exchange_cd: 交易所代码
+    server_name: 数据库服务器名称,默认为 'server93Api'。
+    full: 为 True 时重新拉取全部记录
+
+    返回:
+    结构化数组(calendarDate, isOpen)
+    """
+    path = calendar_snapshot_path(exchange_cd, server_name)
+    existing = np.load(path) if os.path.exists(path) and not full else None
+
+    sql = "SELECT calendarDate, isOpen FROM trade_cal WHERE exchangeCD = :exchange_cd"
+    params = {"exchange_cd": exchange_cd}
+    if existing is not None and len(existing):
+        cutoff = min(
+            np.datetime64(datetime.now().date() - CALENDAR_REFRESH_WINDOW, "D"),
+            existing["calendarDate"][-1] + np.timedelta64(1, "D"),
+        )
+        existing = existing[existing["calendarDate"] < cutoff]
+        sql += " AND calendarDate >= :cutoff"
+        params["cutoff"] = str(cutoff)
+    try:
+        df = Database.query_pd(server_name, sql + " ORDER BY calendarDate", params=params)
+    except Exception as e:
+        if not os.path.exists(path):
+            raise
+        logger.warning("刷新交易日历快照失败, 使用本地快照: %s", e)
+        return np.load(path, mmap_mode="r")
+
+    rows = np.empty(len(df), dtype=_SNAPSHOT_DTYPE)
+    rows["calendarDate"] = _to_days(df["calendarDate"])
+    rows["isOpen"] = df["isOpen"].to_numpy().astype(bool)
+    snapshot = rows if existing is None else np.concatenate([existing, rows])
+
+    os.makedirs(CALENDAR_SNAPSHOT_DIR, exist_ok=True)
+    # 临时文件名带进程号和线程号, 同时刷新时互不覆盖
+    tmp_path = f"{path}.{os.getpid()}.{get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as file:
+            np.save(file, snapshot)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning("写入交易日历快照失败: %s", e)
+        return snapshot
+    return np.load(path, mmap_mode="r")
+
+
+def get_trading_calendar(exchange_cd: str = "XSHG") -> TradingCalendar:
+    """获取指定交易所的交易日历索引"""
+    return TradingCalendar(exchange_cd)
+
+
+def batch_is_trading_day(dates, exchange_cd: str = "XSHG"):
+    """
+    批量判断是否为交易日
+
+    参数:
+    dates: datetime64 数组、pandas Series 或日期字符串列表
+
+    返回:
+    布尔数组(输入为 Series 时返回 Series)
+    """
+    return get_trading_calendar(exchange_cd).is_open_batch(dates)
+
+
+def batch_prev_trading_date(dates, exchange_cd: str = "XSHG"):
+    """
+    批量返回上一个交易日
+
+    参数:
+    dates: datetime64 数组、pandas Series 或日期字符串列表
+
+    返回:
+    datetime64[D] 数组(输入为 Series 时返回 Series)
+    """
+    return get_trading_calendar(exchange_cd).prev_batch(dates)
+
+
+def batch_shift_trading_date(dates, n: int, exchange_cd: str = "XSHG"):
+    """
+    批量将日期偏移n个交易日
+
+    参数:
+    dates: datetime64 数组、pandas Series 或日期字符串列表
+    n: 偏移的交易日数, 正数向后, 负数向前
+
+    返回:
+    datetime64[D] 数组(输入为 Series 时返回 Series)
+    """
+    return get_trading_calendar(exchange_cd).offset_batch(dates, n)
+
+
+def batch_period_end(
+    dates,
+    period: Literal["week", "month", "quarter", "year"],
+    exchange_cd: str = "XSHG",
+):
+    """
+    批量返回日期所在周期的最后一个交易日
+
+    参数:
+    dates: datetime64 数组、pandas Series 或日期字符串列表
+    period: 周期, 可选 week/month/quarter/year
+
+    返回:
+    datetime64[D] 数组(输入为 Series 时返回 Series)
+    """
+    return get_trading_calendar(exchange_cd).period_bound_batch(dates, period)
+
+
+def batch_get_last_friday(dates):
+    """
+    批量返回上周五的日期, 规则与 get_last_friday 相同
+
+    参数:
+    dates: datetime64 数组、pandas Series 或日期字符串列表
+
+    返回:
+    datetime64[D] 数组(输入为 Series 时返回 Series)
+    """
+    days = _to_day_array(dates)
+    weekday = (days.astype("int64") + 3) % 7
+    last_friday = days - ((weekday + 2) % 7 + 1).astype("timedelta64[D]")
+    return _wrap_like(last_friday, dates)
+
+
 def is_market_running(
     scale: Optional[Literal["inner"]] = None,
     open_tm: Optional[time] = None,
@@ -52,13 +502,7 @@ def is_market_running(
     lunch_end = time(13, 0)
 
     if scale is None:
-        now_date = now.strftime("%Y-%m-%d")
-        is_trading_day = Database.query(
-            "server93Api",
-            "SELECT isOpen FROM trade_cal WHERE exchangeCD = 'XSHG' AND calendarDate = '"
-            + now_date
-            + "'",
-        ).fetchone()[0]
+        is_trading_day = get_trading_calendar().is_open(now.date())
 
         if is_trading_day and (
             open_tm <= now_tm < close_tm and not (lunch_start < now_tm < lunch_end)
@@ -84,13 +528,7 @@ def prev_trading_date(date: str):
     if not is_valid_date(date):
         raise ValueError(f"日期格式错误")
 
-    res = Database.query(
-        "server93Api",
-        "SELECT prevTradeDate FROM trade_cal WHERE exchangeCD = 'XSHG' AND calendarDate = '"
-        + date
-        + "'",
-    ).fetchone()[0]
-    return res
+    return get_trading_calendar().prev(date)
 
 
 def is_trading_day(date: str) -> bool:
@@ -107,14 +545,7 @@ def is_trading_day(date: str) -> bool:
     if not is_valid_date(date):
         raise ValueError(f"日期格式错误")
 
-    res = Database.query(
-        "server93Api",
-        "SELECT isOpen FROM trade_cal WHERE exchangeCD = 'XSHG' AND calendarDate = '"
-        + date
-        + "'",
-    ).fetchone()[0]
-
-    return 1 == res
+    return get_trading_calendar().is_open(date)
 
 
 def get_sql_df(date: str):
@@ -125,7 +556,7 @@ def get_sql_df(date: str):
     date: 日期字符串，格式为 YYYY-MM-DD
 
     返回:
-    dataframe: 存储记录日期信息
+    dataframe: 存储记录日期信息, 已经 index_calendar_df 整理(以日期为索引, 含各周期参考日期列)
     """
     if not is_valid_date(date):
         raise ValueError(f"日期格式错误")
@@ -140,79 +571,118 @@ def get_sql_df(date: str):
 
     df = Database.query_pd(
         "server93Api",
-        f"SELECT * FROM trade_cal WHERE exchangeCD = 'XSHG' AND calendarDate BETWEEN '{previous_year_date_str}' and '{date}' ",
+        "SELECT * FROM trade_cal WHERE exchangeCD = 'XSHG' AND calendarDate BETWEEN :start and :end ",
+        params={"start": previous_year_date_str, "end": date},
+    )
+    # 只整理一次, 之后按日期取值为 O(1)
+    return index_calendar_df(df)
+
+
+# 预计算的各周期参考日期列, 与 calculate_financial_dates 返回的键一一对应
+_FINANCIAL_DATE_COLUMNS = {
+    "previous_trading_day": "PREV_TRADE_DATE",
+    "last_trading_day_of_week": "LAST_TRADING_DAY_OF_WEEK",
+    "last_trading_day_of_month": "LAST_TRADING_DAY_OF_MONTH",
+    "last_trading_day_of_quarter": "LAST_TRADING_DAY_OF_QUARTER",
+    "last_trading_day_of_6months": "LAST_TRADING_DAY_OF_6MONTHS",
+    "first_trading_day_of_year": "YEAR_START_DATE",
+}
+
+_PERIOD_COLUMNS = {
+    "week": "LAST_TRADING_DAY_OF_WEEK",
+    "month": "LAST_TRADING_DAY_OF_MONTH",
+    "quarter": "LAST_TRADING_DAY_OF_QUARTER",
+    "6months": "LAST_TRADING_DAY_OF_6MONTHS",
+    "year": "YEAR_START_DATE",
+}
+
+
+def _to_days(values) -> np.ndarray:
+    """将日期列转换为 datetime64[D] 数组"""
+    return pd.to_datetime(pd.Series(values)).to_numpy().astype("datetime64[D]")
+
+
+def index_calendar_df(df) -> pd.DataFrame:
+    """
+    以日期为索引整理 trade_cal 日历表, 并预计算各周期的参考日期列
+
+    参数:
+    df: trade_cal 表的 DataFrame, 已整理过的表(如 get_sql_df 的返回值)直接返回
+
+    返回:
+    DataFrame: 以 CALENDAR_DATE(date) 为索引, 新增
+               LAST_TRADING_DAY_OF_WEEK/MONTH/QUARTER/6MONTHS 列,
+               按日期取值为 O(1)
+    """
+    if "LAST_TRADING_DAY_OF_WEEK" in df.columns:
+        return df
+
+    calendar_days = _to_days(df["CALENDAR_DATE"])
+    frame = df.copy()
+    frame.index = pd.Index(calendar_days.astype(object))
+    # 周期末日期距给定日期超过3天时, 原逻辑不返回结果
+    guard = calendar_days - np.timedelta64(3, "D")
+
+    def lookup(column, keys):
+        return frame[column].reindex(pd.Index(keys.astype(object))).to_numpy()
+
+    def guarded(values, period_end):
+        return np.where(period_end >= guard, values, None)
+
+    def month_start(days):
+        return days.astype("datetime64[M]").astype("datetime64[D]")
+
+    ten_days = np.timedelta64(10, "D")
+
+    # 上周: 本周周末日期往前7天所在周的周末日期
+    week_end = _to_days(frame["WEEK_END_DATE"])
+    frame["LAST_TRADING_DAY_OF_WEEK"] = guarded(
+        lookup("WEEK_END_DATE", week_end - np.timedelta64(7, "D")), week_end
     )
-    return df
+
+    # 上月: 本月月初往前10天所在月的月末日期
+    month_end = _to_days(frame["MONTH_END_DATE"])
+    frame["LAST_TRADING_DAY_OF_MONTH"] = guarded(
+        lookup("MONTH_END_DATE", month_start(month_end) - ten_days), month_end
+    )
+
+    # 上季: 本季季初往前10天所在季的季末日期
+    quarter_end = _to_days(frame["QUARTER_END_DATE"])
+    quarter_start = _to_days(frame["QUARTER_START_DATE"])
+    frame["LAST_TRADING_DAY_OF_QUARTER"] = guarded(
+        lookup("QUARTER_END_DATE", month_start(quarter_start) - ten_days),
+        quarter_end,
+    )
+
+    # 六个月前(按180天简化)所在月的月末日期
+    frame["LAST_TRADING_DAY_OF_6MONTHS"] = lookup(
+        "MONTH_END_DATE", calendar_days - np.timedelta64(6 * 30, "D")
+    )
+    return frame
+
+
+def _value_or_none(value):
+    return None if pd.isna(value) else value
 
 
 def get_previous_trading_day(df, date_str: str) -> datetime.date:
     """获取给定日期的前一个交易日"""
+    frame = index_calendar_df(df)
     date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
-    prev_trade_date = df[df["CALENDAR_DATE"] == date_obj]["PREV_TRADE_DATE"].iloc[0]
-    return prev_trade_date
+    return frame.at[date_obj, "PREV_TRADE_DATE"]
 
 
 def get_last_trading_day_of_period(df, date_str: str, period: str) -> datetime.date:
-    """获取给定日期所在周期的最后一个交易日"""
-    date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
-    last_trading_day = None
+    """
+    获取给定日期所在周期的最后一个交易日
 
-    if period == "week":
-        current_week_end = df[df["CALENDAR_DATE"] == date_obj]["WEEK_END_DATE"].iloc[0]
-        date_obj -= timedelta(days=3)
-        while current_week_end >= date_obj:
-            last_trading_day = current_week_end
-            current_week_end -= timedelta(days=7)
-            current_week_end = df[df["CALENDAR_DATE"] == current_week_end][
-                "WEEK_END_DATE"
-            ].iloc[0]
-            return current_week_end
-
-    elif period == "month":
-        current_month_end = df[df["CALENDAR_DATE"] == date_obj]["MONTH_END_DATE"].iloc[
-            0
-        ]
-        date_obj -= timedelta(days=3)
-        while current_month_end >= date_obj:
-            last_trading_day = current_month_end
-            current_month_end = datetime(
-                current_month_end.year, current_month_end.month, 1
-            ) - timedelta(days=10)
-            current_month_end = current_month_end.date()
-            current_month_end = df[df["CALENDAR_DATE"] == current_month_end][
-                "MONTH_END_DATE"
-            ].iloc[0]
-            return current_month_end
-
-    elif period == "quarter":
-        current_quarter_end = df[df["CALENDAR_DATE"] == date_obj][
-            "QUARTER_END_DATE"
-        ].iloc[0]
-        current_quarter_start = df[df["CALENDAR_DATE"] == date_obj][
-            "QUARTER_START_DATE"
-        ].iloc[0]
-        date_obj -= timedelta(days=3)
-        while current_quarter_end >= date_obj:
-            last_trading_day = current_quarter_start
-            current_quarter_start = datetime(
-                current_quarter_start.year, current_quarter_start.month, 1
-            ) - timedelta(days=10)
-            current_quarter_end = current_quarter_start.date()
-            current_quarter_end = df[df["CALENDAR_DATE"] == current_quarter_end][
-                "QUARTER_END_DATE"
-            ].iloc[0]
-            return current_quarter_end
-
-    elif period == "6months":
-        six_months_ago = date_obj - timedelta(days=6 * 30)  # 简化计算
-        six_months_end = df[df["CALENDAR_DATE"] == six_months_ago][
-            "MONTH_END_DATE"
-        ].iloc[0]
-        return six_months_end
-
-    elif period == "year":
-        year_start_date = df[df["CALENDAR_DATE"] == date_obj]["YEAR_START_DATE"].iloc[0]
-        return year_start_date
+    df 为 get_sql_df 的返回值(已整理)时, 每次取值为 O(1)
+    """
+    if period not in _PERIOD_COLUMNS:
+        return None
+    frame = index_calendar_df(df)
+    date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
+    return _value_or_none(frame.at[date_obj, _PERIOD_COLUMNS[period]])
 
 
 def calculate_financial_dates(df, date_str: str):
@@ -220,34 +690,43 @@ def calculate_financial_dates(df, date_str: str):
     计算给定日期的前一个交易日、前一周的最后一个交易日、前一个月的最后一个交易日、前六个月的最后一个交易日以及年初以来的第一个交易日。
 
     参数：
+    df: get_sql_df 返回的 DataFrame(已整理, 取值为 O(1))
     date_str: 日期字符串，格式为 YYYY-MM-DD
 
     返回：
     dict: 包含计算出的日期的字典
     """
-    previous_trading_day = get_previous_trading_day(df, date_str)
-    last_trading_day_of_week = get_last_trading_day_of_period(df, date_str, "week")
-    last_trading_day_of_month = get_last_trading_day_of_period(df, date_str, "month")
-    last_trading_day_of_quarter = get_last_trading_day_of_period(
-        df, date_str, "quarter"
-    )
-    last_trading_day_of_6months = get_last_trading_day_of_period(
-        df, date_str, "6months"
-    )
-    first_trading_day_of_year = get_last_trading_day_of_period(df, date_str, "year")
+    frame = index_calendar_df(df)
+    date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
+    row = frame.loc[date_obj]
 
     financial_dates = {
-        "previous_trading_day": previous_trading_day,
-        "last_trading_day_of_week": last_trading_day_of_week,
-        "last_trading_day_of_month": last_trading_day_of_month,
-        "last_trading_day_of_quarter": last_trading_day_of_quarter,
-        "last_trading_day_of_6months": last_trading_day_of_6months,
-        "first_trading_day_of_year": first_trading_day_of_year,
+        key: _value_or_none(row[column])
+        for key, column in _FINANCIAL_DATE_COLUMNS.items()
     }
-
     return financial_dates
 
 
+def calculate_financial_dates_range(df, start: str, end: str) -> pd.DataFrame:
+    """
+    批量计算区间内每个日期的各周期参考日期
+
+    参数:
+    df: get_sql_df 返回的 DataFrame, 或经 index_calendar_df 整理后的 DataFrame
+    start: 日期字符串，格式为 YYYY-MM-DD
+    end:   日期字符串，格式为 YYYY-MM-DD
+
+    返回:
+    DataFrame: 以日期为索引, 列与 calculate_financial_dates 返回的键相同
+    """
+    frame = index_calendar_df(df)
+    days = _to_days(frame.index)
+    mask = (days >= np.datetime64(start, "D")) & (days <= np.datetime64(end, "D"))
+    result = frame.loc[mask, list(_FINANCIAL_DATE_COLUMNS.values())]
+    result.columns = list(_FINANCIAL_DATE_COLUMNS.keys())
+    return result.sort_index()
+
+
 def get_trading_days(start: str, end: str) -> list:
     """
     获取交易日期并存储为列表
@@ -266,7 +745,8 @@ def get_trading_days(start: str, end: str) -> list:
 
     df = Database.query_pd(
         "server93Api",
-        f"SELECT calendarDate FROM trade_cal WHERE exchangeCD = 'XSHG' AND isOpen = 1  AND calendarDate BETWEEN '{start}' and '{end}' ",
+        "SELECT calendarDate FROM trade_cal WHERE exchangeCD = 'XSHG' AND isOpen = 1  AND calendarDate BETWEEN :start and :end ",
+        params={"start": start, "end": end},
     )
     tradedate_list = df["calendarDate"].tolist()
     return tradedate_list
@@ -286,7 +766,9 @@ def get_halt_stocks(date: str) -> list:
     date = date.date()
 
     df = Database.query_pd(
-        "server93Api", f"SELECT ticker,isOpen FROM mkt_equd WHERE tradeDate = '{date}'"
+        "server93Api",
+        "SELECT ticker,isOpen FROM mkt_equd WHERE tradeDate = :date",
+        params={"date": date},
     )
 
     df_halt = df[df["isOpen"] == 0]
@@ -308,7 +790,9 @@ def get_st_stocks(date: str) -> list:
     date = date.date()
 
     df = Database.query_pd(
-        "server93Api", f"SELECT ticker FROM sec_st WHERE tradeDate = '{date}'"
+        "server93Api",
+        "SELECT ticker FROM sec_st WHERE tradeDate = :date",
+        params={"date": date},
     )
     st_list = df["ticker"].tolist()
     return st_list
@@ -326,28 +810,151 @@ def get_div_stocks(date: str) -> pd.DataFrame:
     """
 
     df = Database.query_pd(
-        "server93Api", f"SELECT * FROM equ_div WHERE exDivDate = '{date}'"
+        "server93Api",
+        "SELECT * FROM equ_div WHERE exDivDate = :date",
+        params={"date": date},
     )
     return df
 
 
+def _flag_matrix(df: pd.DataFrame, date_col: str, start, end) -> pd.DataFrame:
+    """
+    将 (日期, 股票) 记录整理为 日期 × 股票 的布尔矩阵
+
+    行为区间内的全部交易日(以及记录中出现的其它日期), 列为排序后的股票代码
+    """
+    record_days = _to_days(df[date_col])
+    row_days = np.union1d(
+        get_trading_calendar().trading_days_between(start, end), record_days
+    )
+    col_codes, tickers = pd.factorize(df["ticker"], sort=True)
+    matrix = np.zeros((len(row_days), len(tickers)), dtype=bool)
+    matrix[np.searchsorted(row_days, record_days), col_codes] = True
+    return pd.DataFrame(
+        matrix, index=pd.DatetimeIndex(row_days, name=date_col), columns=tickers
+    )
+
+
+def get_halt_stocks_range(start: str, end: str) -> pd.DataFrame:
+    """
+    一次性获取区间内每个交易日的停牌股票
+
+    参数:
+    start: 日期字符串，格式为 YYYY-MM-DD
+    end:   日期字符串，格式为 YYYY-MM-DD
+
+    返回:
+    DataFrame: 日期 × 股票 的布尔矩阵, True 表示当日停牌
+    """
+    start = datetime.strptime(start, "%Y-%m-%d").date()
+    end = datetime.strptime(end, "%Y-%m-%d").date()
+
+    df = Database.query_pd(
+        "server93Api",
+        "SELECT tradeDate, ticker FROM mkt_equd WHERE isOpen = 0 AND tradeDate BETWEEN :start AND :end",
+        params={"start": start, "end": end},
+    )
+    return _flag_matrix(df, "tradeDate", start, end)
+
+
+def get_st_stocks_range(start: str, end: str) -> pd.DataFrame:
+    """
+    一次性获取区间内每个交易日的ST股票
+
+    参数:
+    start: 日期字符串，格式为 YYYY-MM-DD
+    end:   日期字符串，格式为 YYYY-MM-DD
+
+    返回:
+    DataFrame: 日期 × 股票 的布尔矩阵, True 表示当日为ST
+    """
+    start = datetime.strptime(start, "%Y-%m-%d").date()
+    end = datetime.strptime(end, "%Y-%m-%d").date()
+
+    df = Database.query_pd(
+        "server93Api",
+        "SELECT tradeDate, ticker FROM sec_st WHERE tradeDate BETWEEN :start AND :end",
+        params={"start": start, "end": end},
+    )
+    return _flag_matrix(df, "tradeDate", start, end)
+
+
+def get_div_stocks_range(start: str, end: str) -> pd.DataFrame:
+    """
+    一次性获取区间内每个除息日的分红股票
+
+    参数:
+    start: 日期字符串，格式为 YYYY-MM-DD
+    end:   日期字符串，格式为 YYYY-MM-DD
+
+    返回:
+    DataFrame: 日期 × 股票 的布尔矩阵, True 表示当日除息
+    """
+    start = datetime.strptime(start, "%Y-%m-%d").date()
+    end = datetime.strptime(end, "%Y-%m-%d").date()
+
+    df = Database.query_pd(
+        "server93Api",
+        "SELECT exDivDate, ticker FROM equ_div WHERE exDivDate BETWEEN :start AND :end",
+        params={"start": start, "end": end},
+    )
+    return _flag_matrix(df, "exDivDate", start, end)
+
+
+def flagged_tickers(matrix: pd.DataFrame, date: str) -> list:
+    """
+    从 get_*_stocks_range 返回的矩阵中取出某一天被标记的股票
+
+    参数:
+    matrix: 日期 × 股票 的布尔矩阵
+    date: 日期字符串，格式为 YYYY-MM-DD
+
+    返回:
+    list: 当日被标记的股票代码
+    """
+    return matrix.columns[matrix.loc[date].to_numpy()].tolist()
+
+
 # def Annual(indicator:str,moved_years:int):
 
 
+def _reduce_ignoring_null(args, ufunc, builtin):
+    """
+    逐元素求最值并忽略空值, 全部为空时返回空值
+
+    参数中含 numpy 数组或 pandas Series 时按元素计算, 否则按标量计算
+    """
+    series = next((arg for arg in args if isinstance(arg, pd.Series)), None)
+    if series is None and not any(isinstance(arg, np.ndarray) for arg in args):
+        values = [arg for arg in args if not pd.isna(arg)]
+        return builtin(values) if values else None
+
+    arrays = [
+        np.asarray(arg.to_numpy() if isinstance(arg, pd.Series) else arg, dtype=float)
+        for arg in args
+    ]
+    result = arrays[0]
+    for array in arrays[1:]:
+        result = ufunc(result, array)
+    if series is not None:
+        return pd.Series(result, index=series.index)
+    return result
+
+
 def Less(*args):
     """
     返回所有指标中最小的一个
 
     参数:
-    args: 存储所有指标的参数
+    args: 存储所有指标的参数, 可以是标量、numpy 数组或 pandas Series, 空值不参与比较
 
     返回:
-    min: 所有指标中的最小值
+    min: 所有指标中的最小值, 数组输入时逐元素计算
     """
     if not 1 <= len(args) <= 8:
         raise ValueError("参数数量必须在1到8之间")
 
-    return min(args)
+    return _reduce_ignoring_null(args, np.fmin, min)
 
 
 def Greater(*args):
@@ -355,15 +962,15 @@ def Greater(*args):
     返回所有指标中最大的一个
 
     参数:
-    args: 存储所有指标的参数
+    args: 存储所有指标的参数, 可以是标量、numpy 数组或 pandas Series, 空值不参与比较
 
     返回:
-    min: 所有指标中的最大值
+    min: 所有指标中的最大值, 数组输入时逐元素计算
     """
     if not 1 <= len(args) <= 8:
         raise ValueError("参数数量必须在1到8之间")
 
-    return max(args)
+    return _reduce_ignoring_null(args, np.fmax, max)
 
 
 def get_last_day_of_year(year):
@@ -383,7 +990,7 @@ def get_period_date(tag: str):
     """
     获取前N个交易日对应的日期
     """
-    sql = f"""
+    sql = """
         WITH ranked_dates AS (
             SELECT calendarDate,
                 ROW_NUMBER() OVER (ORDER BY calendarDate DESC) AS row_num
@@ -392,9 +999,9 @@ def get_period_date(tag: str):
         )
         SELECT calendarDate
         FROM ranked_dates
-        WHERE row_num <= {tag}
+        WHERE row_num <= :tag
         ORDER BY calendarDate;
     """
-    df = Database.query_pd("server93Api", sql)
+    df = Database.query_pd("server93Api", sql, params={"tag": int(tag)})
     res = df.sort_values(by="calendarDate")
     return res
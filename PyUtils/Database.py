@@ -1,14 +1,37 @@
 import os
+import re
+import asyncio
+import functools
+import time
+import json
+import pickle
+import hashlib
+import numbers
 import yaml
+import logging
 import importlib.resources
-from threading import Lock
-from sqlalchemy import create_engine, text
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import date, datetime
+from itertools import islice
+from queue import Empty, LifoQueue
+from threading import BoundedSemaphore, Lock, Timer, get_ident
+from sqlalchemy import bindparam, create_engine, event, inspect, text
 from sqlalchemy.orm import sessionmaker
 from contextlib import contextmanager
 from urllib.parse import quote_plus
+import numpy as np
 import pandas as pd
+from pymysql.constants import FIELD_TYPE
 from clickhouse_driver import Client
 
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
 
 class DatabaseConnection:
     _instance = {}
@@ -20,17 +43,14 @@ class DatabaseConnection:
                 instance = super().__new__(cls)
                 cls._instance[server_name] = instance
                 instance.engine = None
+                instance.read_engine = None
                 instance.server_name = server_name
+                instance._sessionmaker = None
         return cls._instance[server_name]
 
     def _load_config(self):
         """加载配置文件或从环境变量获取数据库信息"""
-        try:
-            with importlib.resources.open_text("PyUtils", "config.yaml") as file:
-                config = yaml.safe_load(file)
-        except FileNotFoundError:
-            raise FileNotFoundError("Database config not found.")
-
+        config = load_config()
         if "databases" not in config or self.server_name not in config["databases"]:
             raise ValueError(
                 f"Database configuration for '{self.server_name}' not found."
@@ -42,20 +62,70 @@ class DatabaseConnection:
         """使用连接池创建数据库连接"""
         if self.engine is None:
             db_config = self._load_config()
+            if db_config.get("backend", "mysql") != "mysql":
+                self.engine = create_local_engine(db_config["backend"], db_config["path"])
+                return self.engine
             connection_string = f"mysql+pymysql://{db_config['user']}:{quote_plus(db_config['password'])}@{db_config['host']}/{db_config['name']}"
+            _, (pool_size, max_overflow) = self._pool_sizes()
             self.engine = create_engine(
                 connection_string,
-                pool_size=db_config.get("pool_size", 20),
-                max_overflow=db_config.get("max_overflow", 20),
+                pool_size=pool_size,
+                max_overflow=max_overflow,
                 pool_pre_ping=True,  # 检查连接有效性
             )
         return self.engine
 
+    def connect_read(self):
+        """
+        只读查询使用的连接池, 连接处于 AUTOCOMMIT 模式
+
+        不开启事务, 归还连接时也无需回滚, 省去提交/回滚的网络往返
+        """
+        if self.read_engine is None:
+            db_config = self._load_config()
+            if db_config.get("backend", "mysql") != "mysql":
+                # 本地库没有网络往返, 与写入共用同一个连接池
+                self.read_engine = self.connect()
+                return self.read_engine
+            (pool_size, max_overflow), _ = self._pool_sizes()
+            self.read_engine = create_engine(
+                self.connect().url,
+                pool_size=pool_size,
+                max_overflow=max_overflow,
+                pool_pre_ping=True,
+                pool_reset_on_return=None,
+                isolation_level="AUTOCOMMIT",
+            )
+        return self.read_engine
+
+    def _pool_sizes(self):
+        """
+        只读连接池和读写连接池各自的 (pool_size, max_overflow)
+
+        两个连接池合计不超过配置的 pool_size + max_overflow: 读写连接池固定
+        write_pool_size 个连接(默认5, 不溢出), 其余连接及全部溢出数留给只读查询
+        """
+        db_config = self._load_config()
+        pool_size = db_config.get("pool_size", 20)
+        max_overflow = db_config.get("max_overflow", 20)
+        # pool_size 为 0 时 SQLAlchemy 不限制连接数, 两个连接池都至少保留1个
+        write_size = max(1, min(db_config.get("write_pool_size", 5), pool_size - 1))
+        return (max(1, pool_size - write_size), max_overflow), (write_size, 0)
+
+    def pool_capacity(self) -> int:
+        """
+        只读连接池可同时提供的最大连接数, 用作 query_many 和异步接口的并发上限
+
+        只读查询占用只读连接池, 写入和其它语句占用读写连接池(见 _pool_sizes)
+        """
+        (pool_size, max_overflow), _ = self._pool_sizes()
+        return pool_size + max_overflow
+
     def get_session(self):
         """获取数据库会话对象"""
-        engine = self.connect()
-        Session = sessionmaker(bind=engine)
-        return Session()
+        if self._sessionmaker is None:
+            self._sessionmaker = sessionmaker(bind=self.connect())
+        return self._sessionmaker()
 
     @contextmanager
     def session_scope(self):
@@ -70,6 +140,135 @@ class DatabaseConnection:
         finally:
             session.close()  # 关闭连接
 
+    @staticmethod
+    def _records(df: pd.DataFrame) -> list:
+        """将DataFrame转换为参数列表, NaN/NaT 转为 None, numpy 标量转为 Python 类型"""
+        frame = df.astype(object).where(df.notna(), None)
+        names = [f"c{i}" for i in range(frame.shape[1])]
+        return [dict(zip(names, row)) for row in frame.itertuples(index=False, name=None)]
+
+    def _write(self, df: pd.DataFrame, table: str, sql: str, batch_size: int) -> int:
+        """按批执行 executemany, 每批一个事务"""
+        engine = self.connect()
+        statement = text(sql)
+        for start in range(0, len(df), batch_size):
+            records = self._records(df.iloc[start : start + batch_size])
+            with engine.begin() as conn:
+                conn.execute(statement, records)
+        invalidate_query_cache(table.split(".")[-1])
+        return len(df)
+
+    def _quote(self, name: str) -> str:
+        """按当前数据库方言引用列名"""
+        return self.connect().dialect.identifier_preparer.quote(name)
+
+    def _insert_sql(self, df: pd.DataFrame, table: str) -> str:
+        columns = ", ".join(self._quote(column) for column in df.columns)
+        values = ", ".join(f":c{i}" for i in range(df.shape[1]))
+        return f"INSERT INTO {table} ({columns}) VALUES ({values})"
+
+    def write_df(self, df: pd.DataFrame, table: str, batch_size: int = 10_000) -> int:
+        """
+        批量写入DataFrame
+
+        参数:
+        df: 待写入的数据, 列名与表字段一致
+        table: 表名
+        batch_size: 每批行数, 每批在一个事务中以多行 VALUES 写入
+
+        返回:
+        int: 写入的行数
+        """
+        return self._write(df, table, self._insert_sql(df, table), batch_size)
+
+    def upsert_df(
+        self,
+        df: pd.DataFrame,
+        table: str,
+        batch_size: int = 10_000,
+        update_columns=None,
+        key_columns=None,
+    ) -> int:
+        """
+        批量写入DataFrame, 主键或唯一键冲突时更新已有行
+
+        MySQL 使用 ON DUPLICATE KEY UPDATE, SQLite/DuckDB 使用 ON CONFLICT DO UPDATE
+
+        参数:
+        df: 待写入的数据, 列名与表字段一致
+        table: 表名
+        batch_size: 每批行数, 每批在一个事务中写入
+        update_columns: 冲突时需要更新的列, 默认为除 key_columns 外的全部列
+        key_columns: SQLite/DuckDB 的冲突判断列(主键或唯一键), MySQL 不需要
+
+        返回:
+        int: 写入的行数
+        """
+        key_columns = list(key_columns or [])
+        if update_columns is None:
+            update_columns = [column for column in df.columns if column not in key_columns]
+        quoted = [self._quote(column) for column in update_columns]
+        if self.connect().dialect.name == "mysql":
+            updates = ", ".join(f"{column} = VALUES({column})" for column in quoted)
+            conflict = f"ON DUPLICATE KEY UPDATE {updates}"
+        else:
+            target = ", ".join(self._quote(column) for column in key_columns)
+            updates = ", ".join(f"{column} = excluded.{column}" for column in quoted)
+            conflict = f"ON CONFLICT {f'({target}) ' if target else ''}DO UPDATE SET {updates}"
+        sql = f"{self._insert_sql(df, table)} {conflict}"
+        return self._write(df, table, sql, batch_size)
+
+
+@functools.lru_cache(maxsize=None)
+def load_config() -> dict:
+    """读取并缓存 config.yaml, 设置环境变量 PYUTILS_CONFIG 时读取该路径的配置文件"""
+    try:
+        path = os.environ.get("PYUTILS_CONFIG")
+        if path:
+            with open(os.path.expanduser(path), encoding="utf-8") as file:
+                return yaml.safe_load(file)
+        with importlib.resources.open_text("PyUtils", "config.yaml") as file:
+            return yaml.safe_load(file)
+    except FileNotFoundError:
+        raise FileNotFoundError("Database config not found.")
+
+
+def _sqlite_year(value):
+    return int(str(value)[:4]) if value else None
+
+
+def _register_sqlite_functions(dbapi_connection, connection_record):
+    """注册代码中用到的 MySQL 函数"""
+    dbapi_connection.create_function("YEAR", 1, _sqlite_year, deterministic=True)
+    dbapi_connection.create_function("CURDATE", 0, lambda: date.today().isoformat())
+
+
+def _register_duckdb_macros(dbapi_connection, connection_record):
+    dbapi_connection.execute("CREATE OR REPLACE MACRO curdate() AS current_date")
+
+
+def create_local_engine(backend: str, path: str):
+    """
+    创建本地 SQLite/DuckDB 数据库引擎, 用于离线测试和压测
+
+    参数:
+    backend: sqlite 或 duckdb(需要安装 duckdb_engine)
+    path: 数据库文件路径
+
+    返回:
+    Engine: SQLAlchemy 引擎
+    """
+    path = os.path.expanduser(path)
+    if backend == "sqlite":
+        engine = create_engine(f"sqlite:///{path}")
+        event.listen(engine, "connect", _register_sqlite_functions)
+    elif backend == "duckdb":
+        engine = create_engine(f"duckdb:///{path}")
+        event.listen(engine, "connect", _register_duckdb_macros)
+    else:
+        raise ValueError(f"不支持的数据库类型: {backend}")
+    return engine
+
 
 def get_db_session(server_name: str):
     """获取数据库连接"""
@@ -77,26 +276,1102 @@ def get_db_session(server_name: str):
     return db.session_scope()
 
 
-def query(server_name, sql):
-    """查询函数，查询数据库中的数据"""
-    with get_db_session(server_name) as session:
-        session.query()
-        # result = session.execute(text(sql)).fetchall()
-        return session.execute(text(sql))
+_READ_ONLY_PATTERN = re.compile(
+    r"^\s*(?:/\*.*?\*/\s*)*(SELECT|WITH|SHOW|DESCRIBE|DESC|EXPLAIN)\b",
+    re.IGNORECASE | re.DOTALL,
+)
+_COMMENT_PATTERN = re.compile(r"/\*.*?\*/|--[^\n]*|#[^\n]*", re.DOTALL)
+_MAIN_STATEMENT_PATTERN = re.compile(r"\b(SELECT|INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+
+
+def _top_level(sql: str) -> str:
+    """去掉注释、字符串字面量和括号内的内容, 只保留最外层的文本"""
+    sql = _COMMENT_PATTERN.sub(" ", _QUOTED_PATTERN.sub("''", sql))
+    depth = 0
+    out = []
+    for char in sql:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth = max(depth - 1, 0)
+        elif depth == 0:
+            out.append(char)
+    return "".join(out)
+
+
+def is_read_only(sql: str) -> bool:
+    """
+    判断SQL是否为只读查询(SELECT/SHOW/DESCRIBE/EXPLAIN)
+
+    WITH 开头的语句只有在 CTE 列表之后的主语句为 SELECT 时才是只读的,
+    MySQL 8 中 WITH ... UPDATE/DELETE 会修改数据
+    """
+    match = _READ_ONLY_PATTERN.match(sql)
+    if match is None:
+        return False
+    if match.group(1).upper() != "WITH":
+        return True
+    main = _MAIN_STATEMENT_PATTERN.search(_top_level(sql[match.end() :]))
+    return main is not None and main.group(1).upper() == "SELECT"
+
+
+def _statement(sql: str, params=None):
+    """
+    构建带绑定参数的语句, 列表/元组/集合参数按 IN 列表展开
+
+    如 "WHERE ticker IN :tickers" 配合 {"tickers": ["000001", "600000"]}
+    """
+    statement = text(sql)
+    if not params:
+        return statement, {}
+    params = dict(params)
+    expanding = []
+    for name, value in params.items():
+        if isinstance(value, (list, tuple, set, np.ndarray, pd.Index)):
+            params[name] = list(value)
+            expanding.append(bindparam(name, expanding=True))
+    if expanding:
+        statement = statement.bindparams(*expanding)
+    return statement, params
+
+
+def _params_key(params) -> str:
+    """
+    绑定参数的规范表示, 用作结果缓存和相同查询合并的键
+
+    数组和 Index 展开为元组(其 repr 会截断过长的内容), 集合排序后展开, 最后取摘要
+    """
+    items = []
+    for name, value in sorted(params.items()):
+        if isinstance(value, (np.ndarray, pd.Index)):
+            value = tuple(value.tolist())
+        elif isinstance(value, set):
+            value = tuple(sorted(value, key=repr))
+        elif isinstance(value, (list, tuple)):
+            value = tuple(value)
+        items.append((name, value))
+    return hashlib.sha1(repr(items).encode("utf-8")).hexdigest()
+
+
+@contextmanager
+def _execute(server_name, sql, trace=None, params=None):
+    """
+    执行SQL并返回结果, query 和 query_pd 共用
+
+    只读查询直接在 AUTOCOMMIT 连接池的连接上执行, 不创建 ORM 会话也不提交;
+    其它语句仍通过会话执行并提交事务
+    """
+    db = DatabaseConnection(server_name)
+    statement, params = _statement(sql, params)
+    if is_read_only(sql):
+        with db.connect_read().connect() as conn:
+            if trace is not None:
+                trace.lap("checkout")
+            result = conn.execute(statement, params)
+            if trace is not None:
+                trace.lap("execute")
+            yield result
+    else:
+        with db.session_scope() as session:
+            if trace is not None:
+                session.connection()
+                trace.lap("checkout")
+            result = session.execute(statement, params)
+            if trace is not None:
+                trace.lap("execute")
+            yield result
+
+
+def query(server_name, sql, params=None):
+    """
+    查询函数，查询数据库中的数据
+
+    参数:
+    server_name: 数据库服务器名称
+    sql: 查询语句, 可使用 :name 形式的绑定参数
+    params: 可选, 绑定参数字典
+    """
+    trace = _profiler.trace(server_name, sql) if _profiler is not None else None
+    with _execute(server_name, sql, trace, params) as result:
+        rows = max(result.rowcount, 0)
+        if result.returns_rows:
+            # 连接归还前读出全部结果
+            result = result.freeze()()
+    if trace is not None:
+        trace.lap("fetch")
+        trace.finish(rows=rows)
+    return result
+
 
+_MYSQL_KINDS = {
+    **dict.fromkeys(
+        [
+            FIELD_TYPE.TINY,
+            FIELD_TYPE.SHORT,
+            FIELD_TYPE.LONG,
+            FIELD_TYPE.LONGLONG,
+            FIELD_TYPE.INT24,
+            FIELD_TYPE.YEAR,
+        ],
+        "int",
+    ),
+    **dict.fromkeys(
+        [FIELD_TYPE.FLOAT, FIELD_TYPE.DOUBLE, FIELD_TYPE.DECIMAL, FIELD_TYPE.NEWDECIMAL],
+        "float",
+    ),
+    **dict.fromkeys(
+        [FIELD_TYPE.DATE, FIELD_TYPE.NEWDATE, FIELD_TYPE.DATETIME, FIELD_TYPE.TIMESTAMP],
+        "datetime",
+    ),
+}
 
-def query_pd(server_name, sql):
-    """查询函数，查询数据库中的数据并返回DataFrame"""
-    with get_db_session(server_name) as session:
-        # 执行SQL查询
-        result = session.execute(text(sql))
+
+def _clickhouse_kind(type_name: str) -> str:
+    """将 ClickHouse 列类型映射为 int/float/datetime/object"""
+    nullable = type_name.startswith("Nullable(")
+    for wrapper in ("Nullable(", "LowCardinality("):
+        if type_name.startswith(wrapper):
+            type_name = type_name[len(wrapper) : -1]
+    if type_name.startswith(("Int", "UInt")):
+        return "float" if nullable else "int"
+    if type_name.startswith(("Float", "Decimal")):
+        return "float"
+    if type_name.startswith(("Date", "DateTime")):
+        return "datetime"
+    return "object"
+
+
+def _column_array(values, kind: str, dtype=None):
+    """将一列值直接转换为带类型的 numpy 数组"""
+    if dtype is not None:
+        return np.array(values, dtype=dtype)
+    if kind == "int":
+        # 含空值的整数列转为浮点, 否则由 numpy 推断 int64/uint64
+        if None in values:
+            return np.array(values, dtype="float64")
+        return np.array(values) if len(values) else np.array([], dtype="int64")
+    if kind == "float":
+        return np.array(values, dtype="float64")
+    if kind == "datetime":
+        return pd.to_datetime(np.array(values, dtype=object)).to_numpy()
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def frame_from_columns(columns, column_names, kinds=None, dtype=None) -> pd.DataFrame:
+    """
+    由按列组织的数据构建DataFrame, 不经过逐行对象和 object 类型推断
+
+    参数:
+    columns: 每列的值序列
+    column_names: 列名
+    kinds: 每列的类型 int/float/datetime/object, 为None时按 object 处理
+    dtype: 可选, {列名: numpy dtype}, 如 {"closePrice": "float32"}
+
+    返回:
+    DataFrame
+    """
+    kinds = kinds or ["object"] * len(column_names)
+    dtype = dtype or {}
+    arrays = {
+        i: _column_array(values, kind, dtype.get(name))
+        for i, (values, name, kind) in enumerate(zip(columns, column_names, kinds))
+    }
+    df = pd.DataFrame(arrays, copy=False)
+    df.columns = list(column_names)
+    return df
+
+
+def frame_from_rows(rows, column_names, description=None, dtype=None) -> pd.DataFrame:
+    """
+    由查询返回的行按列转置后构建带类型的DataFrame
+
+    参数:
+    rows: 行数据
+    column_names: 列名
+    description: 可选, DBAPI 游标的 description, 用其中的类型码决定每列的 dtype
+    dtype: 可选, {列名: numpy dtype}
+
+    返回:
+    DataFrame
+    """
+    columns = list(zip(*rows)) if rows else [()] * len(column_names)
+    kinds = None
+    if description is not None:
+        kinds = [_MYSQL_KINDS.get(column[1], "object") for column in description]
+    return frame_from_columns(columns, column_names, kinds, dtype)
+
+
+_TABLE_PATTERN = re.compile(r"\b(?:FROM|JOIN|INTO|UPDATE)\s+([`\w.]+)", re.IGNORECASE)
+
+
+_QUOTED_PATTERN = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`", re.DOTALL)
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """规整SQL文本: 合并引号外的空白并去掉结尾分号, 作为缓存键; 字符串字面量保持原样"""
+    pieces = []
+    pos = 0
+    for match in _QUOTED_PATTERN.finditer(sql):
+        pieces.append(_WHITESPACE_PATTERN.sub(" ", sql[pos : match.start()]))
+        pieces.append(match.group())
+        pos = match.end()
+    pieces.append(_WHITESPACE_PATTERN.sub(" ", sql[pos:]))
+    return "".join(pieces).strip().rstrip(";").strip()
+
+
+def sql_tables(sql: str) -> set:
+    """提取SQL中引用的表名(小写, 不含库名)"""
+    return {
+        name.replace("`", "").split(".")[-1].lower()
+        for name in _TABLE_PATTERN.findall(sql)
+    }
+
+
+class QueryCache:
+    """
+    query_pd 的查询结果缓存
+
+    以 (服务器名, 规整后的SQL) 为键, 每条记录有过期时间, 内存按字节数做 LRU 淘汰,
+    可按表失效; 指定 disk_dir 时结果同时写入磁盘, 供其它进程复用
+    """
+
+    def __init__(self, ttl: float = 300, max_bytes: int = 512 * 1024**2, disk_dir=None):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (过期时间, 字节数, 表名集合, DataFrame)
+        self._bytes = 0
+        self._lock = Lock()
+        if disk_dir is not None:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def _key(server_name: str, sql: str):
+        return server_name, normalize_sql(sql)
+
+    @staticmethod
+    def _digest(key) -> str:
+        return hashlib.sha1("\n".join(key).encode("utf-8")).hexdigest()
+
+    def get(self, server_name: str, sql: str):
+        """返回缓存结果的副本, 未命中或已过期时返回 None"""
+        key = self._key(server_name, sql)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < now:
+                self._drop(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[3].copy()
+
+        entry = self._disk_get(key, now)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._store(key, *entry)
+        return entry[2].copy()
+
+    def put(self, server_name: str, sql: str, df: pd.DataFrame, ttl=None):
+        """写入查询结果"""
+        key = self._key(server_name, sql)
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        tables = sql_tables(sql)
+        df = df.copy()
+        with self._lock:
+            self._store(key, expires, tables, df)
+        self._disk_put(key, expires, tables, df)
+
+    def _store(self, key, expires, tables, df):
+        nbytes = int(df.memory_usage(index=True, deep=True).sum())
+        if key in self._entries:
+            self._drop(key)
+        if nbytes > self.max_bytes:
+            return
+        self._entries[key] = (expires, nbytes, tables, df)
+        self._bytes += nbytes
+        while self._bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry[1]
+
+    def invalidate(self, table=None):
+        """
+        使缓存失效
+
+        参数:
+        table: 表名, 只清除引用了该表的结果; 为None时清空全部缓存
+        """
+        table = table.lower() if table is not None else None
+        with self._lock:
+            for key in list(self._entries):
+                if table is None or table in self._entries[key][2]:
+                    self._drop(key)
+        if self.disk_dir is None:
+            return
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith(".json"):
+                continue
+            meta_path = os.path.join(self.disk_dir, name)
+            try:
+                with open(meta_path, encoding="utf-8") as file:
+                    meta = json.load(file)
+            except (OSError, ValueError):
+                continue
+            if table is None or table in meta["tables"]:
+                self._disk_remove(name[: -len(".json")])
+
+    def _disk_paths(self, digest: str):
+        return (
+            os.path.join(self.disk_dir, f"{digest}.json"),
+            os.path.join(self.disk_dir, f"{digest}.pkl"),
+        )
+
+    def _disk_get(self, key, now):
+        if self.disk_dir is None:
+            return None
+        digest = self._digest(key)
+        meta_path, data_path = self._disk_paths(digest)
+        try:
+            with open(meta_path, encoding="utf-8") as file:
+                meta = json.load(file)
+            if meta["expires"] < now:
+                self._disk_remove(digest)
+                return None
+            with open(data_path, "rb") as file:
+                df = pickle.load(file)
+        except (OSError, ValueError, pickle.UnpicklingError):
+            return None
+        return meta["expires"], set(meta["tables"]), df
+
+    def _disk_put(self, key, expires, tables, df):
+        if self.disk_dir is None:
+            return
+        meta_path, data_path = self._disk_paths(self._digest(key))
+        # 临时文件名带进程号和线程号, 多个进程同时写入同一条缓存时互不覆盖
+        suffix = f"{os.getpid()}.{get_ident()}.tmp"
+        try:
+            with open(f"{data_path}.{suffix}", "wb") as file:
+                pickle.dump(df, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(f"{data_path}.{suffix}", data_path)
+            with open(f"{meta_path}.{suffix}", "w", encoding="utf-8") as file:
+                json.dump({"expires": expires, "tables": sorted(tables)}, file)
+            os.replace(f"{meta_path}.{suffix}", meta_path)
+        except OSError as e:
+            logger.warning("写入查询缓存失败: %s", e)
+            for path in (f"{data_path}.{suffix}", f"{meta_path}.{suffix}"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _disk_remove(self, digest: str):
+        for path in self._disk_paths(digest):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        """返回命中/未命中次数及内存占用"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+
+_query_cache = None
+
+
+def enable_query_cache(ttl: float = 300, max_bytes: int = 512 * 1024**2, disk_dir=None):
+    """
+    开启 query_pd 的结果缓存
+
+    参数:
+    ttl: 缓存有效期(秒)
+    max_bytes: 内存缓存上限(字节)
+    disk_dir: 可选, 磁盘缓存目录, 跨进程复用结果
+
+    返回:
+    QueryCache: 缓存对象
+    """
+    global _query_cache
+    _query_cache = QueryCache(ttl=ttl, max_bytes=max_bytes, disk_dir=disk_dir)
+    return _query_cache
+
+
+def disable_query_cache():
+    """关闭 query_pd 的结果缓存"""
+    global _query_cache
+    _query_cache = None
+
+
+def get_query_cache():
+    """返回当前的结果缓存, 未开启时为 None"""
+    return _query_cache
+
+
+# 其它模块的内存缓存(如 Algorithm.FundamentalStore)注册的失效回调
+_invalidation_callbacks = []
+
+
+def register_cache_invalidation(callback):
+    """
+    注册缓存失效回调, invalidate_query_cache 时一并调用
+
+    参数:
+    callback: 函数, 参数为表名(小写, 不含库名), 为 None 时表示全部
+    """
+    _invalidation_callbacks.append(callback)
+
+
+def invalidate_query_cache(table=None):
+    """按表(或全部)清除结果缓存及已注册的其它缓存, 写入数据后调用"""
+    if _query_cache is not None:
+        _query_cache.invalidate(table)
+    for callback in _invalidation_callbacks:
+        callback(table.lower() if table is not None else None)
+
+
+_LITERAL_PATTERN = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|\b\d+(?:\.\d+)?\b")
+_IN_LIST_PATTERN = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+
+
+def sql_fingerprint(sql: str) -> str:
+    """SQL指纹: 规整空白后将字符串和数字字面量替换为 ?, IN 列表合并为 IN (?)"""
+    fingerprint = _LITERAL_PATTERN.sub("?", normalize_sql(sql))
+    return _IN_LIST_PATTERN.sub("IN (?)", fingerprint)
+
+
+class _QueryTrace:
+    """单次查询的分阶段计时"""
+
+    __slots__ = ("profiler", "server_name", "sql", "phases", "started", "last")
+
+    def __init__(self, profiler, server_name, sql):
+        self.profiler = profiler
+        self.server_name = server_name
+        self.sql = sql
+        self.phases = {}
+        self.started = self.last = time.perf_counter()
+
+    def lap(self, phase: str):
+        """记录从上一阶段结束到现在的耗时"""
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self.last
+        self.last = now
+
+    def resume(self):
+        """流式查询中跳过调用方处理数据块的时间, 不计入任何阶段和总耗时"""
+        now = time.perf_counter()
+        self.started += now - self.last
+        self.last = now
+
+    def finish(self, rows: int = 0, nbytes: int = 0):
+        self.profiler.record(
+            self.server_name, self.sql, self.last - self.started, self.phases, rows, nbytes
+        )
+
+
+class QueryProfiler:
+    """
+    查询耗时统计
+
+    按阶段(checkout 取连接, execute 服务端执行, fetch 取回数据, frame 构建DataFrame)
+    记录每条查询的耗时、行数、字节数和服务器, 按SQL指纹聚合, 每个指纹保留最近
+    window 次耗时用于计算分位数; 超过 slow_threshold 秒的查询写入日志
+    """
+
+    PHASES = ("checkout", "execute", "fetch", "frame")
+
+    def __init__(self, slow_threshold: float = 1.0, window: int = 1000):
+        self.slow_threshold = slow_threshold
+        self.window = window
+        self._stats = {}
+        self._lock = Lock()
+
+    def trace(self, server_name: str, sql: str) -> _QueryTrace:
+        """开始一次查询计时"""
+        return _QueryTrace(self, server_name, sql)
+
+    def record(self, server_name, sql, elapsed, phases, rows=0, nbytes=0):
+        """记录一次查询"""
+        fingerprint = sql_fingerprint(sql)
+        with self._lock:
+            stats = self._stats.get(fingerprint)
+            if stats is None:
+                stats = self._stats[fingerprint] = {
+                    "count": 0,
+                    "total": 0.0,
+                    "max": 0.0,
+                    "rows": 0,
+                    "bytes": 0,
+                    "phases": dict.fromkeys(self.PHASES, 0.0),
+                    "servers": set(),
+                    "recent": deque(maxlen=self.window),
+                }
+            stats["count"] += 1
+            stats["total"] += elapsed
+            stats["max"] = max(stats["max"], elapsed)
+            stats["rows"] += rows
+            stats["bytes"] += nbytes
+            for phase, seconds in phases.items():
+                stats["phases"][phase] = stats["phases"].get(phase, 0.0) + seconds
+            stats["servers"].add(server_name)
+            stats["recent"].append(elapsed)
+
+        if elapsed >= self.slow_threshold:
+            detail = " ".join(f"{phase}={seconds:.3f}s" for phase, seconds in phases.items())
+            logger.warning(
+                "慢查询 %.3fs [%s] rows=%d bytes=%d %s: %s",
+                elapsed, server_name, rows, nbytes, detail, normalize_sql(sql),
+            )
+
+    def snapshot(self) -> dict:
+        """
+        返回统计快照
+
+        返回:
+        dict: {SQL指纹: {count, total, mean, max, p50, p95, p99, rows, bytes, phases, servers}}
+        """
+        with self._lock:
+            items = [
+                (fingerprint, dict(stats, recent=np.array(stats["recent"]),
+                                   phases=dict(stats["phases"]), servers=set(stats["servers"])))
+                for fingerprint, stats in self._stats.items()
+            ]
+        snapshot = {}
+        for fingerprint, stats in items:
+            recent = stats.pop("recent")
+            p50, p95, p99 = np.percentile(recent, [50, 95, 99]) if len(recent) else (0.0,) * 3
+            snapshot[fingerprint] = {
+                **stats,
+                "mean": stats["total"] / stats["count"],
+                "p50": float(p50),
+                "p95": float(p95),
+                "p99": float(p99),
+                "servers": sorted(stats["servers"]),
+            }
+        return snapshot
+
+    def to_prometheus(self, prefix: str = "pyutils_query") -> str:
+        """以 Prometheus 文本格式导出统计快照"""
+
+        def label(value: str) -> str:
+            return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+        snapshot = [
+            (f'sql="{label(fingerprint)}"', stats)
+            for fingerprint, stats in self.snapshot().items()
+        ]
+        lines = [f"# TYPE {prefix}_duration_seconds summary"]
+        for sql, stats in snapshot:
+            for quantile, key in (("0.5", "p50"), ("0.95", "p95"), ("0.99", "p99")):
+                lines.append(f'{prefix}_duration_seconds{{{sql},quantile="{quantile}"}} {stats[key]}')
+            lines.append(f"{prefix}_duration_seconds_sum{{{sql}}} {stats['total']}")
+            lines.append(f"{prefix}_duration_seconds_count{{{sql}}} {stats['count']}")
+        lines.append(f"# TYPE {prefix}_phase_seconds_total counter")
+        for sql, stats in snapshot:
+            for phase, seconds in stats["phases"].items():
+                lines.append(f'{prefix}_phase_seconds_total{{{sql},phase="{phase}"}} {seconds}')
+        for name, key in (("rows_total", "rows"), ("bytes_total", "bytes")):
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for sql, stats in snapshot:
+                lines.append(f"{prefix}_{name}{{{sql}}} {stats[key]}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """清空统计"""
+        with self._lock:
+            self._stats.clear()
+
+
+_profiler = None
+
+
+def enable_query_profiler(slow_threshold: float = 1.0, window: int = 1000):
+    """
+    开启查询耗时统计
+
+    参数:
+    slow_threshold: 慢查询阈值(秒), 超过时写入日志
+    window: 每个SQL指纹保留的最近耗时个数
+
+    返回:
+    QueryProfiler: 统计对象
+    """
+    global _profiler
+    _profiler = QueryProfiler(slow_threshold=slow_threshold, window=window)
+    return _profiler
+
+
+def disable_query_profiler():
+    """关闭查询耗时统计"""
+    global _profiler
+    _profiler = None
+
+
+def get_query_profiler():
+    """返回当前的统计对象, 未开启时为 None"""
+    return _profiler
+
+
+def query_pd(
+    server_name,
+    sql,
+    use_cache: bool = True,
+    columnar: bool = False,
+    dtype=None,
+    params=None,
+):
+    """
+    查询函数，查询数据库中的数据并返回DataFrame
+
+    参数:
+    server_name: 数据库服务器名称
+    sql: 查询语句, 可使用 :name 形式的绑定参数, 如 "WHERE ticker = :ticker"
+    use_cache: 已通过 enable_query_cache 开启缓存时是否使用缓存, 默认为 True
+    columnar: 为 True 时按游标描述的列类型直接构建数值/时间列, 不经过 object 推断
+    dtype: 可选, {列名: numpy dtype}, 指定时使用按列构建, 如 {"closePrice": "float32"}
+    params: 可选, 绑定参数字典, 列表值按 IN 列表展开, 如 {"tickers": ["000001", "600000"]}
+
+    相同的只读查询并发执行时只查询一次, 其它调用方等待并共享结果(见 disable_single_flight)
+    """
+    columnar = columnar or dtype is not None
+    cache = _query_cache if use_cache else None
+    cache_sql = sql
+    if columnar:
+        # 按列构建的结果类型不同, 单独缓存
+        cache_sql = f"/* columnar {sorted((dtype or {}).items())} */ {sql}"
+    if params:
+        cache_sql = f"{cache_sql} /* params {_params_key(params)} */"
+    if cache is not None:
+        df = cache.get(server_name, cache_sql)
+        if df is not None:
+            return df
+
+    if not _single_flight or not is_read_only(sql):
+        df = _fetch_pd(server_name, sql, columnar, dtype, params)
+        if cache is not None:
+            cache.put(server_name, cache_sql, df)
+        return df
+
+    # 相同的查询正在执行时等待其结果, 不重复发送; cache_sql 含绑定参数摘要, 参数不同不会合并
+    key = (server_name, normalize_sql(cache_sql))
+    with _inflight_lock:
+        flight = _inflight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _inflight[key] = [Future(), 0]
+        else:
+            flight[1] += 1
+    if not leader:
+        return flight[0].result().copy()
+
+    try:
+        df = _fetch_pd(server_name, sql, columnar, dtype, params)
+    except BaseException as e:
+        with _inflight_lock:
+            del _inflight[key]
+        flight[0].set_exception(e)
+        raise
+    with _inflight_lock:
+        del _inflight[key]
+        followers = flight[1]
+    flight[0].set_result(df)
+    if cache is not None:
+        cache.put(server_name, cache_sql, df)
+    # 有其它调用方共享结果时返回副本, 避免调用方修改影响他人
+    return df.copy() if followers else df
+
+
+def _fetch_pd(server_name, sql, columnar, dtype, params) -> pd.DataFrame:
+    """执行查询并构建DataFrame"""
+    trace = _profiler.trace(server_name, sql) if _profiler is not None else None
+    with _execute(server_name, sql, trace, params) as result:
         # 获取列名
-        column_names = result.keys()
+        column_names = list(result.keys())
+        description = result.cursor.description if columnar else None
         # 获取所有行的数据
         data = result.fetchall()
-        # 创建DataFrame\
-        df = pd.DataFrame(data, columns=column_names)
-        return df
+        if trace is not None:
+            trace.lap("fetch")
+        # 创建DataFrame
+        if columnar:
+            df = frame_from_rows(data, column_names, description, dtype)
+        else:
+            df = pd.DataFrame(data, columns=column_names)
+    if trace is not None:
+        trace.lap("frame")
+        trace.finish(rows=len(df), nbytes=int(df.memory_usage(index=False).sum()))
+    return df
+
+
+_single_flight = True
+_inflight = {}  # (服务器名, 规整后的SQL及参数摘要) -> [Future, 等待者数量]
+_inflight_lock = Lock()
+
+
+def enable_single_flight():
+    """开启相同查询合并(默认开启): 相同查询正在执行时, 后来的调用方等待并共享其结果"""
+    global _single_flight
+    _single_flight = True
+
+
+def disable_single_flight():
+    """关闭相同查询合并, 每次调用都单独查询数据库"""
+    global _single_flight
+    _single_flight = False
+
+
+class LookupBatcher:
+    """
+    单键查询合并器
+
+    短时间窗口内提交的多个单键查询合并为一次 "WHERE key IN :keys" 查询, 键过多时
+    按 chunk_size 分块, 结果按键列拆分后通过 Future 分发给各调用方。
+    合并需由调用方显式创建并共用同一个实例, Calendar 和 Algorithm 中的单键函数不使用
+
+    示例:
+    batcher = LookupBatcher(
+        "server93Api",
+        "SELECT ticker, tradeDate, closePrice FROM mkt_equd WHERE ticker IN :keys AND tradeDate = :date",
+        key="ticker",
+        params={"date": "2024-06-28"},
+    )
+    df = batcher.load("000001")
+    """
+
+    def __init__(
+        self,
+        server_name: str,
+        sql: str,
+        key: str,
+        params=None,
+        window: float = 0.005,
+        chunk_size: int = 1000,
+    ):
+        """
+        参数:
+        server_name: 数据库服务器名称
+        sql: 查询语句, 必须包含 :keys 绑定参数
+        key: 结果中用于分发的键列名
+        params: 可选, 其它固定的绑定参数
+        window: 合并窗口(秒), 窗口内提交的键合并为一次查询
+        chunk_size: 每次查询的最大键数
+        """
+        self.server_name = server_name
+        self.sql = sql
+        self.key = key
+        self.params = dict(params or {})
+        self.window = window
+        self.chunk_size = chunk_size
+        self._pending = {}  # 键 -> [Future, ...]
+        self._timer = None
+        self._lock = Lock()
+
+    def submit(self, value) -> Future:
+        """提交一个键, 返回对应结果的 Future"""
+        future = Future()
+        with self._lock:
+            self._pending.setdefault(value, []).append(future)
+            if len(self._pending) >= self.chunk_size:
+                flush_now = True
+            else:
+                flush_now = False
+                if self._timer is None:
+                    self._timer = Timer(self.window, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+        if flush_now:
+            self.flush()
+        return future
+
+    def load(self, value, timeout=None) -> pd.DataFrame:
+        """查询单个键, 返回该键对应的行"""
+        return self.submit(value).result(timeout)
+
+    def load_many(self, values) -> pd.DataFrame:
+        """直接按块查询多个键, 返回合并后的结果"""
+        values = list(dict.fromkeys(values))
+        frames = [
+            self._query(values[i : i + self.chunk_size])
+            for i in range(0, len(values), self.chunk_size)
+        ]
+        if not frames:
+            return self._query([])
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+    def _query(self, keys: list) -> pd.DataFrame:
+        return query_pd(self.server_name, self.sql, params={**self.params, "keys": keys})
+
+    def flush(self):
+        """立即执行所有待处理的键"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        keys = list(pending)
+        for i in range(0, len(keys), self.chunk_size):
+            chunk = keys[i : i + self.chunk_size]
+            # 查询或分发中的任何异常都要传给尚未完成的 Future, 否则 load() 会一直等待
+            try:
+                df = self._query(chunk)
+                groups = dict(tuple(df.groupby(self.key, sort=False)))
+                empty = df.iloc[0:0]
+                for value in chunk:
+                    rows = groups.get(value, empty).reset_index(drop=True)
+                    for future in pending[value]:
+                        if not future.done():
+                            future.set_result(rows.copy())
+            except Exception as e:
+                for value in chunk:
+                    for future in pending[value]:
+                        if not future.done():
+                            future.set_exception(e)
+
+
+def query_many(jobs, max_workers=None, timeout=None, raise_errors: bool = False) -> list:
+    """
+    并行执行多条查询, 充分利用各服务器的连接池
+
+    参数:
+    jobs: [(server_name, sql), ...] 或 [(server_name, sql, params), ...]
+    max_workers: 线程数, 默认为各服务器连接池容量之和(不超过查询条数)
+    timeout: 可选, 每条查询开始执行后的最长等待秒数, 超时记为 TimeoutError
+    raise_errors: 为 True 时遇到第一个失败的查询即抛出异常
+
+    返回:
+    list: 与 jobs 顺序一致, 成功为 DataFrame, 失败为对应的异常对象
+    """
+    jobs = list(jobs)
+    if not jobs:
+        return []
+
+    # 每个服务器的并发数不超过其连接池容量, 避免等待连接池超时
+    capacity = {
+        server_name: DatabaseConnection(server_name).pool_capacity()
+        for server_name in {job[0] for job in jobs}
+    }
+    semaphores = {name: BoundedSemaphore(size) for name, size in capacity.items()}
+    if max_workers is None:
+        max_workers = sum(capacity.values())
+    max_workers = max(1, min(max_workers, len(jobs)))
+
+    started = {}
+
+    def run(index, server_name, sql, params=None):
+        with semaphores[server_name]:
+            started[index] = time.monotonic()
+            return query_pd(server_name, sql, params=params)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = [
+            executor.submit(run, index, *job) for index, job in enumerate(jobs)
+        ]
+        results = []
+        for index, future in enumerate(futures):
+            while timeout is not None and not future.done():
+                start = started.get(index)
+                if start is None:
+                    # 仍在排队, 尚未开始计时
+                    wait([future], timeout=0.05)
+                    continue
+                remaining = start + timeout - time.monotonic()
+                if remaining <= 0:
+                    break
+                wait([future], timeout=remaining)
+
+            if not future.done():
+                future.cancel()
+                error = TimeoutError(f"查询超时({timeout}秒): {jobs[index][1]}")
+            else:
+                error = future.exception()
+            if error is not None and raise_errors:
+                raise error
+            results.append(error if error is not None else future.result())
+        return results
+    finally:
+        # 超时的查询在后台结束, 不阻塞调用方
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def query_chunks(server_name, sql, chunksize: int = 100_000, dtype=None, params=None):
+    """
+    流式查询, 按固定行数分块返回DataFrame
+
+    使用服务端游标逐块读取, 峰值内存只与 chunksize 有关, 与结果总行数无关;
+    在只读连接池上执行, 不占用写入使用的连接
+
+    参数:
+    server_name: 数据库服务器名称
+    sql: 查询语句, 可使用 :name 形式的绑定参数
+    chunksize: 每块的行数
+    dtype: 可选, {列名: numpy dtype}, 指定时按列类型构建每块
+    params: 可选, 绑定参数字典, 列表值按 IN 列表展开
+
+    返回:
+    生成器: 逐块产出 DataFrame
+    """
+    trace = _profiler.trace(server_name, sql) if _profiler is not None else None
+    statement, params = _statement(sql, params)
+    engine = DatabaseConnection(server_name).connect_read()
+    rows_read = nbytes = 0
+    try:
+        with engine.connect() as conn:
+            if trace is not None:
+                trace.lap("checkout")
+            result = conn.execution_options(
+                stream_results=True, max_row_buffer=chunksize
+            ).execute(statement, params)
+            if trace is not None:
+                trace.lap("execute")
+            column_names = list(result.keys())
+            description = result.cursor.description
+            for rows in result.partitions(chunksize):
+                if trace is not None:
+                    trace.lap("fetch")
+                if dtype is None:
+                    chunk = pd.DataFrame(rows, columns=column_names)
+                else:
+                    chunk = frame_from_rows(rows, column_names, description, dtype)
+                rows_read += len(chunk)
+                if trace is not None:
+                    trace.lap("frame")
+                    nbytes += int(chunk.memory_usage(index=False).sum())
+                yield chunk
+                if trace is not None:
+                    trace.resume()
+    except Exception:
+        # 与 query/query_pd 一致, 失败的查询不计入统计
+        trace = None
+        raise
+    finally:
+        if trace is not None:
+            trace.finish(rows=rows_read, nbytes=nbytes)
+
+
+def query_fold(
+    server_name, sql, func, initial=None, chunksize: int = 100_000, dtype=None, params=None
+):
+    """
+    流式查询并把各块结果折叠为一个累计值
+
+    参数:
+    server_name: 数据库服务器名称
+    sql: 查询语句, 可使用 :name 形式的绑定参数
+    func: 折叠函数 func(累计值, DataFrame块) -> 新的累计值
+    initial: 累计值初始值
+    chunksize: 每块的行数
+    dtype: 可选, {列名: numpy dtype}
+    params: 可选, 绑定参数字典
+
+    返回:
+    折叠后的累计值
+    """
+    acc = initial
+    for chunk in query_chunks(server_name, sql, chunksize, dtype, params):
+        acc = func(acc, chunk)
+    return acc
+
+
+class LocalClickHouseClient:
+    """
+    以本地 SQLite/DuckDB 文件代替 ClickHouse 的客户端
+
+    实现 get_df/iter_df/write_df 用到的 clickhouse_driver.Client 接口子集
+    (execute、execute_iter、disconnect), 每个 ClickHouse 数据库对应一个本地文件,
+    SQL 中的 "库名." 前缀会被去掉
+    """
+
+    _TYPES = {int: "Int64", float: "Float64", str: "String", bool: "UInt8"}
+
+    def __init__(self, database: str, engine):
+        self.database = database
+        self.engine = engine
+        self._prefix = re.compile(rf"\b{re.escape(database)}\.(?=[`\w])")
+
+    def _sql(self, sql: str) -> str:
+        return self._prefix.sub("", sql).replace("`", '"')
+
+    def _column_types(self, names, rows) -> list:
+        column_types = []
+        for i, name in enumerate(names):
+            value = next((row[i] for row in rows if row[i] is not None), None)
+            column_types.append((name, self._TYPES.get(type(value), "String")))
+        return column_types
+
+    def execute(self, sql: str, params=None, with_column_types=False, columnar=False, **kwargs):
+        match = re.match(r"\s*DESCRIBE\s+TABLE\s+(\S+)", sql, re.IGNORECASE)
+        if match:
+            columns = inspect(self.engine).get_columns(self._sql(match.group(1)).strip('"'))
+            return [(column["name"], str(column["type"])) for column in columns]
+
+        with self.engine.begin() as conn:
+            if params is not None:
+                # INSERT INTO t (cols) VALUES, 数据按行或按列给出
+                rows = list(zip(*params)) if columnar else [tuple(row) for row in params]
+                width = len(rows[0]) if rows else 0
+                values = ", ".join(["?"] * width)
+                statement = f"{self._sql(sql)} ({values})"
+                if conn.dialect.paramstyle != "qmark":
+                    statement = statement.replace("?", "%s")
+                if rows:
+                    conn.exec_driver_sql(statement, rows)
+                return len(rows)
+            result = conn.exec_driver_sql(self._sql(sql))
+            names = list(result.keys())
+            rows = [tuple(row) for row in result.fetchall()]
+
+        data = [list(column) for column in zip(*rows)] if columnar else rows
+        if with_column_types:
+            return data, self._column_types(names, rows)
+        return data
+
+    def execute_iter(self, sql: str, with_column_types=False, settings=None, **kwargs):
+        block = (settings or {}).get("max_block_size", 65536)
+        with self.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True).exec_driver_sql(self._sql(sql))
+            names = list(result.keys())
+            first = True
+            for rows in result.partitions(block):
+                rows = [tuple(row) for row in rows]
+                if first and with_column_types:
+                    yield self._column_types(names, rows)
+                first = False
+                yield from rows
+            if first and with_column_types:
+                yield self._column_types(names, [])
+
+    def disconnect(self):
+        pass
+
+
+def clickhouse_config() -> dict:
+    """config.yaml 中的 clickhouse 配置"""
+    return dict(load_config().get("clickhouse", {}))
+
+
+@functools.lru_cache(maxsize=None)
+def _local_clickhouse_engine(database: str):
+    config = clickhouse_config()
+    return create_local_engine(config["backend"], config["path"].format(database=database))
 
 
 def choose_database(database: str) -> Client:
@@ -107,19 +1382,528 @@ def choose_database(database: str) -> Client:
     database: 数据库名称  分为datayes和dataapi
 
     返回:
-    Client: clickhouse读取的交互的客户端接口
-    """
-    click_client = Client(
-        host="192.168.1.91",
-        port="9000",
-        user="uer",
-        password="your_password",
-        database=database,
-    )
+    Client: clickhouse读取的交互的客户端接口; 配置了本地 backend 时为 LocalClickHouseClient
+    """
+    config = clickhouse_config()
+    backend = config.pop("backend", "clickhouse")
+    if backend != "clickhouse":
+        return LocalClickHouseClient(database, _local_clickhouse_engine(database)), database
+    config.pop("path", None)
+    click_client = Client(**config, database=database)
     return click_client, database
 
 
-def get_df(database: str, table: str, start: str, end: str) -> pd.DataFrame:
+class ClickHouseConnection:
+    """
+    ClickHouse 客户端连接池, 每个数据库一个实例
+
+    clickhouse_driver 的 Client 不是线程安全的, 池中每个 Client 同一时刻只借给一个线程,
+    用完归还复用, 避免每次查询重新建立 TCP 连接和握手; 表结构在首次 DESCRIBE 后缓存
+    """
+
+    _instance = {}
+    _lock = Lock()
+
+    def __new__(cls, database: str, pool_size: int = 8):
+        with cls._lock:
+            if database not in cls._instance:
+                instance = super().__new__(cls)
+                cls._instance[database] = instance
+                instance.database = database
+                instance.pool_size = pool_size
+                instance._idle = LifoQueue()
+                instance._available = BoundedSemaphore(pool_size)
+                instance._schemas = {}
+        return cls._instance[database]
+
+    @contextmanager
+    def client(self):
+        """借出一个 Client, 出错时断开该连接而不归还"""
+        self._available.acquire()
+        try:
+            try:
+                click_client = self._idle.get_nowait()
+            except Empty:
+                click_client, _ = choose_database(self.database)
+            try:
+                yield click_client
+            except BaseException:
+                # 包括流式读取中途放弃(GeneratorExit), 连接状态不确定, 直接断开
+                click_client.disconnect()
+                raise
+            self._idle.put(click_client)
+        finally:
+            self._available.release()
+
+    def execute(self, sql: str, **kwargs):
+        """使用池中的连接执行查询"""
+        with self.client() as click_client:
+            return click_client.execute(sql, **kwargs)
+
+    def write_df(self, df: pd.DataFrame, table: str, batch_size: int = 100_000) -> int:
+        """
+        按列批量写入DataFrame
+
+        参数:
+        df: 待写入的数据, 列名与表字段一致
+        table: 表名
+        batch_size: 每批行数
+
+        返回:
+        int: 写入的行数
+        """
+        names = ", ".join(f"`{column}`" for column in df.columns)
+        sql = f"INSERT INTO {table} ({names}) VALUES"
+        for start in range(0, len(df), batch_size):
+            batch = df.iloc[start : start + batch_size]
+            data = [batch[column].tolist() for column in batch.columns]
+            self.execute(sql, params=data, columnar=True)
+        if _partition_cache is not None:
+            _partition_cache.clear(self.database, table.split(".")[-1])
+        return len(df)
+
+    def describe(self, table: str) -> list:
+        """返回表结构 [(列名, 类型), ...], 首次查询后缓存"""
+        schema = self._schemas.get(table)
+        if schema is None:
+            describe_result = self.execute(f"DESCRIBE TABLE {table}")
+            schema = [(row[0], row[1]) for row in describe_result]
+            self._schemas[table] = schema
+        return schema
+
+    def close(self):
+        """断开所有空闲连接"""
+        while True:
+            try:
+                self._idle.get_nowait().disconnect()
+            except Empty:
+                break
+
+
+def _sql_literal(value) -> str:
+    """将 Python 值转换为 SQL 字面量, 仅支持字符串、数值、日期时间和 None"""
+    if value is None:
+        return "NULL"
+    if isinstance(value, np.datetime64):
+        value = pd.Timestamp(value)
+    if isinstance(value, datetime):
+        value = value.strftime("%Y-%m-%d %H:%M:%S")
+    elif isinstance(value, date):
+        value = value.strftime("%Y-%m-%d")
+    if isinstance(value, str):
+        return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+    if isinstance(value, (bool, np.bool_)):
+        return "1" if value else "0"
+    if isinstance(value, numbers.Number):
+        return str(value)
+    raise TypeError(f"不支持的过滤值类型: {type(value).__name__}")
+
+
+def _check_columns(database: str, table: str, columns):
+    """按缓存的表结构校验列名"""
+    known = {name for name, _ in ClickHouseConnection(database).describe(table)}
+    unknown = [column for column in columns if column not in known]
+    if unknown:
+        raise ValueError(f"表 {table} 中不存在列: {unknown}")
+
+
+def _trading_day(value) -> int:
+    """校验并转换 YYYYMMDD 格式的日期, 用于拼接 tradingday 条件"""
+    try:
+        day = int(str(value))
+        if len(str(day)) != 8:
+            raise ValueError
+        datetime.strptime(str(day), "%Y%m%d")
+    except ValueError:
+        raise ValueError(f"日期格式错误, 应为 YYYYMMDD: {value!r}")
+    return day
+
+
+def _clickhouse_select(
+    database: str, table: str, start: str, end: str, columns=None, filters=None
+) -> str:
+    """
+    构建 ClickHouse 查询语句, 将列投影和过滤条件下推到服务端
+
+    参数:
+    columns: 可选, 需要的列名列表, 会按缓存的表结构校验
+    filters: 可选, {列名: 值或值列表} 或 SQL 条件字符串列表; 字典的列名同样校验,
+             值为 None 时条件为 IS NULL
+    """
+    if columns:
+        _check_columns(database, table, columns)
+        select = ", ".join(f"`{column}`" for column in columns)
+    else:
+        select = "*"
+
+    conditions = [f"tradingday BETWEEN {_trading_day(start)} AND {_trading_day(end)}"]
+    if isinstance(filters, dict):
+        _check_columns(database, table, filters)
+        for column, value in filters.items():
+            if isinstance(value, (list, tuple, set, np.ndarray, pd.Index)):
+                values = ", ".join(_sql_literal(v) for v in value)
+                conditions.append(f"`{column}` IN ({values})" if values else "0")
+            elif value is None:
+                conditions.append(f"`{column}` IS NULL")
+            else:
+                conditions.append(f"`{column}` = {_sql_literal(value)}")
+    elif filters:
+        conditions.extend(filters)
+    return f"SELECT {select} FROM {database}.{table} WHERE {' AND '.join(conditions)}"
+
+
+def iter_df(
+    database: str,
+    table: str,
+    start: str,
+    end: str,
+    columns=None,
+    filters=None,
+    chunksize: int = 100_000,
+    dtype=None,
+):
+    """
+    流式读取数据表中给定日期区间的数据, 按块返回DataFrame
+
+    参数:
+    database: 数据库名称  分为datayes和dataapi
+    table: 表格名称, 格式为字符串
+    start: 日期数据，格式为 YYYYMMDD
+    end:   日期数据，格式为 YYYYMMDD
+    columns: 可选, 需要的列名列表
+    filters: 可选, {列名: 值或值列表} 或 SQL 条件字符串列表, 如 {"ticker": ["000001", "600000"]}
+    chunksize: 每块的行数
+    dtype: 可选, {列名: numpy dtype}
+
+    返回:
+    生成器: 逐块产出 DataFrame
+    """
+    sql = _clickhouse_select(database, table, start, end, columns, filters)
+    frames = _iter_frames(database, sql, chunksize, dtype)
+    next(frames)
+    yield from frames
+
+
+def _iter_frames(database: str, sql: str, chunksize: int, dtype=None):
+    """流式执行查询, 先产出 (列名列表, 列类型列表), 再逐块产出 DataFrame"""
+    columns = _iter_columns(database, sql, chunksize, dtype)
+    column_names, kinds = next(columns)
+    yield column_names, kinds
+    for arrays in columns:
+        df = pd.DataFrame(dict(enumerate(arrays)), copy=False)
+        df.columns = column_names
+        yield df
+
+
+def _iter_columns(database: str, sql: str, chunksize: int, dtype=None):
+    """流式执行查询, 先产出 (列名列表, 列类型列表), 再逐块产出每列的 numpy 数组"""
+    dtype = dtype or {}
+    with ClickHouseConnection(database).client() as click_client:
+        rows = click_client.execute_iter(
+            sql, with_column_types=True, settings={"max_block_size": chunksize}
+        )
+        column_types = next(rows)
+        column_names = [name for name, _ in column_types]
+        kinds = [_clickhouse_kind(type_name) for _, type_name in column_types]
+        yield column_names, kinds
+        while True:
+            chunk = list(islice(rows, chunksize))
+            if not chunk:
+                break
+            yield [
+                _column_array(values, kind, dtype.get(name))
+                for values, name, kind in zip(zip(*chunk), column_names, kinds)
+            ]
+
+
+def _fetch_df_chunked(database: str, sql: str, chunksize: int, dtype=None) -> pd.DataFrame:
+    """
+    流式读取并逐块填入预分配的列数组, 峰值内存约为一份结果加一个数据块
+
+    先查询总行数按此分配每列数组, 查询期间新增的行按需扩容; 某块的类型更宽
+    (如整数列出现空值)时该列整体提升类型
+    """
+    total = ClickHouseConnection(database).execute(f"SELECT count(*) FROM ({sql})")[0][0]
+    chunks = _iter_columns(database, sql, chunksize, dtype)
+    column_names, kinds = next(chunks)
+    arrays = None
+    filled = 0
+    for chunk in chunks:
+        size = len(chunk[0])
+        if arrays is None:
+            arrays = [np.empty(max(total, size), dtype=values.dtype) for values in chunk]
+        for j, array in enumerate(arrays):
+            values = chunk[j]
+            kind = np.result_type(array.dtype, values.dtype)
+            if kind != array.dtype:
+                array = array.astype(kind)
+            if filled + size > len(array):
+                grown = np.empty(max(filled + size, 2 * len(array)), dtype=array.dtype)
+                grown[:filled] = array[:filled]
+                array = grown
+            array[filled : filled + size] = values
+            arrays[j] = array
+        filled += size
+        del chunk
+
+    if arrays is None:
+        # 空结果按流式查询返回的列类型构建, 不再重复查询
+        return frame_from_columns([()] * len(column_names), column_names, kinds, dtype)
+    df = pd.DataFrame({j: array[:filled] for j, array in enumerate(arrays)}, copy=False)
+    df.columns = list(column_names)
+    return df
+
+
+def _fetch_df(
+    database: str,
+    table: str,
+    start: str,
+    end: str,
+    dtype=None,
+    columns=None,
+    filters=None,
+    chunksize=None,
+) -> pd.DataFrame:
+    """从 ClickHouse 读取数据, 参数同 get_df"""
+    sql = _clickhouse_select(database, table, start, end, columns, filters)
+    if chunksize is not None:
+        return _fetch_df_chunked(database, sql, chunksize, dtype)
+
+    trace = _profiler.trace(f"clickhouse:{database}", sql) if _profiler is not None else None
+    with ClickHouseConnection(database).client() as click_client:
+        if trace is not None:
+            trace.lap("checkout")
+        # 按列返回数据, 列名和类型随查询结果一并返回, 无需额外 DESCRIBE
+        data, column_types = click_client.execute(
+            sql, columnar=True, with_column_types=True
+        )
+    if trace is not None:
+        trace.lap("execute")
+    column_names = [name for name, _ in column_types]
+    kinds = [_clickhouse_kind(type_name) for _, type_name in column_types]
+    if not data:
+        data = [()] * len(column_names)
+    df = frame_from_columns(data, column_names, kinds, dtype)
+    if trace is not None:
+        trace.lap("frame")
+        trace.finish(rows=len(df), nbytes=int(df.memory_usage(index=False).sum()))
+    return df
+
+
+class PartitionCache:
+    """
+    get_df 的本地分区缓存
+
+    每个 (数据库, 表, 交易日) 的数据存为一个 Parquet 文件, 每张表的 manifest.json
+    记录已缓存的日期及行数(无数据的日期行数为0, 不写文件)。只缓存今天之前的日期,
+    缺失的日期按连续区间合并成一次查询从 ClickHouse 读取; 文件总大小超过上限时按
+    最近访问时间淘汰
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 20 * 1024**3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._bytes = sum(size for _, size, _ in self._files())
+
+    def _table_dir(self, database: str, table: str) -> str:
+        return os.path.join(self.cache_dir, database, table)
+
+    def _day_path(self, database: str, table: str, day: int) -> str:
+        return os.path.join(self._table_dir(database, table), f"{day}.parquet")
+
+    def _files(self):
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if not name.endswith(".parquet"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _read_manifest(self, database: str, table: str) -> dict:
+        path = os.path.join(self._table_dir(database, table), "manifest.json")
+        try:
+            with open(path, encoding="utf-8") as file:
+                return {int(day): rows for day, rows in json.load(file).items()}
+        except (OSError, ValueError):
+            return {}
+
+    def _write_manifest(self, database: str, table: str, manifest: dict):
+        path = os.path.join(self._table_dir(database, table), "manifest.json")
+        tmp_path = f"{path}.{os.getpid()}.{get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({str(day): rows for day, rows in sorted(manifest.items())}, file)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _days(start, end) -> list:
+        dates = pd.date_range(pd.Timestamp(str(start)), pd.Timestamp(str(end)), freq="D")
+        return [int(day) for day in dates.strftime("%Y%m%d")]
+
+    @staticmethod
+    def _runs(days: list) -> list:
+        """将日期列表合并为连续区间 [(起始日, 结束日), ...]"""
+        runs = []
+        for day in days:
+            previous = pd.Timestamp(str(day)) - pd.Timedelta(days=1)
+            if runs and runs[-1][1] == int(previous.strftime("%Y%m%d")):
+                runs[-1][1] = day
+            else:
+                runs.append([day, day])
+        return [tuple(run) for run in runs]
+
+    def get_df(
+        self, database: str, table: str, start, end, columns=None, dtype=None, chunksize=None
+    ) -> pd.DataFrame:
+        """读取数据, 已缓存的日期读本地文件, 其余日期从 ClickHouse 读取并写入缓存"""
+        if columns:
+            _check_columns(database, table, columns)
+        today = int(time.strftime("%Y%m%d"))
+        manifest = self._read_manifest(database, table)
+
+        frames = {}
+        missing = []
+        for day in self._days(start, end):
+            rows = manifest.get(day) if day < today else None
+            if rows == 0:
+                continue
+            path = self._day_path(database, table, day)
+            if rows is None or not os.path.exists(path):
+                missing.append(day)
+                continue
+            try:
+                frames[day] = pd.read_parquet(path, columns=columns)
+                os.utime(path)
+            except (OSError, ValueError) as e:
+                logger.warning("读取分区缓存失败: %s", e)
+                missing.append(day)
+
+        if missing:
+            runs = self._runs(missing)
+            condition = " OR ".join(f"tradingday BETWEEN {a} AND {b}" for a, b in runs)
+            fetched = _fetch_df(
+                database, table, missing[0], missing[-1],
+                filters=[f"({condition})"], chunksize=chunksize,
+            )
+            groups = {int(day): part for day, part in fetched.groupby("tradingday", sort=False)}
+            self._store(database, table, groups, [day for day in missing if day < today])
+            for day, part in groups.items():
+                frames[day] = part[list(columns)] if columns else part
+
+        if frames:
+            df = pd.concat([frames[day] for day in sorted(frames)], ignore_index=True)
+        elif missing:
+            df = fetched[list(columns)] if columns else fetched
+        else:
+            schema = ClickHouseConnection(database).describe(table)
+            df = pd.DataFrame(columns=list(columns) if columns else [name for name, _ in schema])
+        if dtype:
+            df = df.astype({name: kind for name, kind in dtype.items() if name in df})
+        return df
+
+    def _store(self, database: str, table: str, groups: dict, days: list):
+        """将从 ClickHouse 读取的数据按交易日写入缓存"""
+        if not days:
+            return
+        os.makedirs(self._table_dir(database, table), exist_ok=True)
+        written = 0
+        counts = {}
+        for day in days:
+            part = groups.get(day)
+            counts[day] = 0 if part is None else len(part)
+            if part is None:
+                continue
+            path = self._day_path(database, table, day)
+            tmp_path = f"{path}.{os.getpid()}.{get_ident()}.tmp"
+            try:
+                part.to_parquet(tmp_path, index=False)
+                os.replace(tmp_path, path)
+                written += os.path.getsize(path)
+            except OSError as e:
+                logger.warning("写入分区缓存失败: %s", e)
+                counts.pop(day)
+
+        with self._lock:
+            manifest = self._read_manifest(database, table)
+            manifest.update(counts)
+            self._write_manifest(database, table, manifest)
+            self._bytes += written
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """按最近访问时间淘汰文件, 直到总大小降到上限的90%"""
+        files = sorted(self._files(), key=lambda item: item[2])
+        self._bytes = sum(size for _, size, _ in files)
+        for path, size, _ in files:
+            if self._bytes <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._bytes -= size
+
+    def clear(self, database=None, table=None):
+        """清除缓存, 可指定数据库或表"""
+        target = self.cache_dir
+        if database is not None:
+            target = os.path.join(target, database)
+            if table is not None:
+                target = os.path.join(target, table)
+        with self._lock:
+            for root, _, names in os.walk(target):
+                for name in names:
+                    if name.endswith((".parquet", ".json")):
+                        try:
+                            os.remove(os.path.join(root, name))
+                        except OSError:
+                            pass
+            self._bytes = sum(size for _, size, _ in self._files())
+
+
+_partition_cache = None
+
+
+def enable_partition_cache(cache_dir: str, max_bytes: int = 20 * 1024**3):
+    """
+    开启 get_df 的本地分区缓存, 需要安装 pyarrow
+
+    参数:
+    cache_dir: 缓存目录
+    max_bytes: 缓存文件总大小上限(字节)
+
+    返回:
+    PartitionCache: 缓存对象
+    """
+    global _partition_cache
+    if pyarrow is None:
+        raise ImportError("分区缓存需要安装 pyarrow")
+    _partition_cache = PartitionCache(cache_dir, max_bytes=max_bytes)
+    return _partition_cache
+
+
+def disable_partition_cache():
+    """关闭 get_df 的本地分区缓存"""
+    global _partition_cache
+    _partition_cache = None
+
+
+def get_df(
+    database: str,
+    table: str,
+    start: str,
+    end: str,
+    dtype=None,
+    columns=None,
+    filters=None,
+    chunksize=None,
+) -> pd.DataFrame:
     """
     获取选取数据表中给定日期区间的所有数据
 
@@ -128,15 +1912,105 @@ def get_df(database: str, table: str, start: str, end: str) -> pd.DataFrame:
     table: 表格名称, 格式为字符串
     start: 日期数据，格式为 YYYYMMDD
     end:   日期数据，格式为 YYYYMMDD
+    dtype: 可选, {列名: numpy dtype}, 如 {"price": "float32"}
+    columns: 可选, 需要的列名列表, 默认为全部列
+    filters: 可选, {列名: 值或值列表} 或 SQL 条件字符串列表, 如 {"ticker": ["000001", "600000"]}
+    chunksize: 可选, 指定时按块流式读取后合并, 避免原始行数据与DataFrame同时驻留内存
 
     返回:
     DataFrame: 包含所选表格对应日期区间的所有数据
+
+    开启分区缓存(enable_partition_cache)且未指定 filters 时, 历史日期从本地缓存读取
     """
-    click_client, database = choose_database(database=database)
-    describe_result = click_client.execute(f"DESCRIBE TABLE {table}")
-    # 提取列名
-    column_names = [row[0] for row in describe_result]
-    sql = f"SELECT * FROM {database}.{table} WHERE tradingday BETWEEN {start} AND {end}"
-    all_data = click_client.execute(sql)
-    df = pd.DataFrame(all_data, columns=column_names)
-    return df
+    if _partition_cache is not None and not filters:
+        return _partition_cache.get_df(
+            database, table, start, end, columns=columns, dtype=dtype, chunksize=chunksize
+        )
+    return _fetch_df(database, table, start, end, dtype, columns, filters, chunksize)
+
+
+class AsyncDatabaseConnection:
+    """
+    数据库查询的 asyncio 接口, 每个服务器一个实例
+
+    查询在该服务器专属的线程池中执行, 线程数等于连接池容量, 大量并发请求在池中排队,
+    不会为每个请求单独创建线程, 也不会阻塞事件循环
+    """
+
+    _instance = {}
+    _lock = Lock()
+
+    def __new__(cls, server_name, max_workers=None):
+        with cls._lock:
+            if server_name not in cls._instance:
+                instance = super().__new__(cls)
+                cls._instance[server_name] = instance
+                instance.server_name = server_name
+                instance.max_workers = max_workers
+                instance._executor = None
+        return cls._instance[server_name]
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                max_workers = self.max_workers
+                if max_workers is None:
+                    max_workers = DatabaseConnection(self.server_name).pool_capacity()
+                self._executor = ThreadPoolExecutor(
+                    max_workers=max_workers, thread_name_prefix=f"db-{self.server_name}"
+                )
+            return self._executor
+
+    async def run(self, func, *args, **kwargs):
+        """在该服务器的线程池中执行同步函数"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(), functools.partial(func, *args, **kwargs)
+        )
+
+    async def query_pd(self, sql, **kwargs) -> pd.DataFrame:
+        """异步执行 query_pd"""
+        return await self.run(query_pd, self.server_name, sql, **kwargs)
+
+    def close(self):
+        """关闭线程池"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+async def aquery_pd(server_name, sql, **kwargs) -> pd.DataFrame:
+    """query_pd 的异步版本, 参数相同"""
+    return await AsyncDatabaseConnection(server_name).query_pd(sql, **kwargs)
+
+
+async def aquery_many(jobs) -> list:
+    """
+    并发执行多条查询
+
+    参数:
+    jobs: [(server_name, sql), ...] 或 [(server_name, sql, params), ...]
+
+    返回:
+    list: 与 jobs 顺序一致, 成功为 DataFrame, 失败为对应的异常对象
+    """
+    return await asyncio.gather(
+        *(
+            aquery_pd(job[0], job[1], params=job[2] if len(job) > 2 else None)
+            for job in jobs
+        ),
+        return_exceptions=True,
+    )
+
+
+# ClickHouse 查询线程池的默认线程数
+CLICKHOUSE_ASYNC_WORKERS = 8
+
+
+async def aget_df(database: str, table: str, start: str, end: str, **kwargs) -> pd.DataFrame:
+    """get_df 的异步版本, 参数相同"""
+    connection = AsyncDatabaseConnection(
+        f"clickhouse:{database}", max_workers=CLICKHOUSE_ASYNC_WORKERS
+    )
+    return await connection.run(get_df, database, table, start, end, **kwargs)
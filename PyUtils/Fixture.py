@@ -0,0 +1,406 @@
+# 测试数据模块
+import os
+import argparse
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+import yaml
+from PyUtils import Database
+
+# 生成的配置文件中指向本地库的服务器名
+FIXTURE_SERVERS = ("server93Api", "joinquant", "mysql18")
+
+# 报告期月份对应的报告类型
+_REPORT_TYPES = {3: "Q1", 6: "S1", 9: "Q3", 12: "A"}
+
+
+def _iso(values) -> np.ndarray:
+    """日期数组转换为 YYYY-MM-DD 字符串, 空值为 None"""
+    index = pd.DatetimeIndex(values)
+    return np.where(index.isna(), None, index.strftime("%Y-%m-%d"))
+
+
+def _calendar(start, end):
+    """
+    生成日历及开市标记, 周末和固定节假日(元旦、春节、劳动节、国庆)休市
+
+    返回:
+    (DatetimeIndex, ndarray): 全部自然日及对应的是否开市
+    """
+    days = pd.date_range(start, end, freq="D")
+    month_day = days.month * 100 + days.day
+    holiday = (
+        (month_day == 101)
+        | ((month_day >= 210) & (month_day <= 216))
+        | ((month_day >= 501) & (month_day <= 503))
+        | ((month_day >= 1001) & (month_day <= 1007))
+    )
+    is_open = (days.dayofweek < 5) & ~holiday
+    return days, np.asarray(is_open)
+
+
+def _trade_cal(days: pd.DatetimeIndex, is_open: np.ndarray) -> pd.DataFrame:
+    """生成 trade_cal 表, 包含各周期首末交易日列"""
+    open_days = days[is_open]
+    prev_index = np.searchsorted(open_days.values, days.values, side="left") - 1
+    prev_days = np.where(
+        prev_index >= 0, open_days.values[np.maximum(prev_index, 0)], np.datetime64("NaT")
+    )
+
+    def period_bound(freq, how):
+        keys = open_days.to_period(freq)
+        bounds = pd.Series(open_days, index=keys).groupby(level=0).agg(how)
+        return bounds.reindex(days.to_period(freq)).to_numpy()
+
+    frame = pd.DataFrame(
+        {
+            "calendarDate": _iso(days),
+            "isOpen": is_open.astype(int),
+            "prevTradeDate": _iso(prev_days),
+            "CALENDAR_DATE": _iso(days),
+            "PREV_TRADE_DATE": _iso(prev_days),
+            "WEEK_END_DATE": _iso(period_bound("W", "max")),
+            "MONTH_END_DATE": _iso(period_bound("M", "max")),
+            "QUARTER_START_DATE": _iso(period_bound("Q", "min")),
+            "QUARTER_END_DATE": _iso(period_bound("Q", "max")),
+            "YEAR_START_DATE": _iso(period_bound("Y", "min")),
+        }
+    )
+    return pd.concat(
+        [frame.assign(exchangeCD=exchange) for exchange in ("XSHG", "XSHE")],
+        ignore_index=True,
+    )
+
+
+def _tickers(n_tickers: int) -> list:
+    """生成股票代码, 沪市主板、深市主板、创业板交替"""
+    prefixes = (600000, 1, 300001)
+    return [str(prefixes[i % 3] + i // 3).zfill(6) for i in range(n_tickers)]
+
+
+def _sec_id(tickers) -> list:
+    return [f"{ticker}.{'XSHG' if ticker.startswith('6') else 'XSHE'}" for ticker in tickers]
+
+
+def _mkt_equd(tickers: list, trading_days: pd.DatetimeIndex, rng) -> pd.DataFrame:
+    """生成 mkt_equd 日行情, 价格为几何随机游走, 含上市日期差异和少量停牌"""
+    n_tickers, n_days = len(tickers), len(trading_days)
+    returns = rng.normal(0.0003, 0.02, size=(n_tickers, n_days))
+    halted = rng.random((n_tickers, n_days)) < 0.005
+    returns[halted] = 0.0
+    close = rng.uniform(5, 50, size=(n_tickers, 1)) * np.exp(np.cumsum(returns, axis=1))
+    close = np.round(close, 2)
+    pre_close = np.concatenate([close[:, :1], close[:, :-1]], axis=1)
+    open_price = np.round(pre_close * (1 + rng.normal(0, 0.005, size=close.shape)), 2)
+    high = np.maximum(open_price, close) * (1 + np.abs(rng.normal(0, 0.01, size=close.shape)))
+    low = np.minimum(open_price, close) * (1 - np.abs(rng.normal(0, 0.01, size=close.shape)))
+    volume = np.where(halted, 0, rng.lognormal(15, 1, size=close.shape)).round()
+    shares = rng.lognormal(20, 1, size=(n_tickers, 1))
+
+    # 约10%的股票在区间前半段上市
+    listed = np.ones((n_tickers, n_days), dtype=bool)
+    late = rng.random(n_tickers) < 0.1
+    listing_day = rng.integers(0, max(n_days // 2, 1), size=n_tickers)
+    listed[late] = np.arange(n_days) >= listing_day[late, None]
+
+    rows, cols = np.nonzero(listed)
+    ticker_array = np.asarray(tickers, dtype=object)
+    return pd.DataFrame(
+        {
+            "secID": np.asarray(_sec_id(tickers), dtype=object)[rows],
+            "ticker": ticker_array[rows],
+            "tradeDate": _iso(trading_days[cols]),
+            "isOpen": (~halted[rows, cols]).astype(int),
+            "preClosePrice": pre_close[rows, cols],
+            "openPrice": open_price[rows, cols],
+            "highPrice": np.round(high[rows, cols], 2),
+            "lowPrice": np.round(low[rows, cols], 2),
+            "closePrice": close[rows, cols],
+            "turnoverVol": volume[rows, cols],
+            "turnoverValue": np.round(volume[rows, cols] * close[rows, cols], 2),
+            "marketValue": np.round(shares[rows, 0] * close[rows, cols], 2),
+            "chgPct": np.round(close[rows, cols] / pre_close[rows, cols] - 1, 4),
+        }
+    )
+
+
+def _fundamentals(tickers: list, start, end, rng) -> dict:
+    """
+    生成 fdmt_is_2018/fdmt_bs_2018/fdmt_cf_2018 财报
+
+    利润表和现金流量表为年初至今累计值; 约8%的报告期有更正记录(发布日期更晚, ID更大)
+    """
+    end_dates = pd.date_range(
+        pd.Timestamp(start) - pd.DateOffset(years=1), end, freq="QE"
+    )
+    n_tickers, n_periods = len(tickers), len(end_dates)
+    ticker_index = np.repeat(np.arange(n_tickers), n_periods)
+    period_index = np.tile(np.arange(n_periods), n_tickers)
+    period_end = end_dates[period_index]
+    months = period_end.month.to_numpy()
+
+    annual = rng.lognormal(21, 1.2, size=n_tickers)
+    growth = rng.normal(0.08, 0.1, size=n_tickers)
+    years = (period_end.year - end_dates[0].year).to_numpy()
+    share = np.select([months == 3, months == 6, months == 9], [0.22, 0.48, 0.74], 1.0)
+    revenue = annual[ticker_index] * (1 + growth[ticker_index]) ** years * share
+    revenue *= 1 + rng.normal(0, 0.05, size=revenue.shape)
+    margin = rng.normal(0.08, 0.05, size=n_tickers)[ticker_index]
+    n_income = revenue * margin
+    t_assets = annual[ticker_index] * rng.uniform(1.5, 3, size=n_tickers)[ticker_index]
+    t_liab = t_assets * rng.uniform(0.3, 0.7, size=n_tickers)[ticker_index]
+
+    lag = np.where(
+        months == 12,
+        rng.integers(60, 120, size=months.shape),
+        rng.integers(20, 60, size=months.shape),
+    )
+    publish = period_end + pd.to_timedelta(lag, unit="D")
+    base = pd.DataFrame(
+        {
+            "ticker": np.asarray(tickers, dtype=object)[ticker_index],
+            "secID": np.asarray(_sec_id(tickers), dtype=object)[ticker_index],
+            "endDate": period_end,
+            "publishDate": publish,
+            "reportType": [_REPORT_TYPES[month] for month in months],
+            "revenue": revenue,
+            "NIncome": n_income,
+            "TProfit": n_income * 1.25,
+            "operateProfit": n_income * 1.22,
+            "TAssets": t_assets,
+            "TLiab": t_liab,
+            "TEquityAttrP": t_assets - t_liab,
+            "NCFOperateA": n_income * rng.uniform(0.6, 1.4, size=n_income.shape),
+            "NCFInvestA": -revenue * rng.uniform(0.02, 0.1, size=n_income.shape),
+            "NCFFrFinanA": revenue * rng.normal(0, 0.03, size=n_income.shape),
+        }
+    )
+
+    revised = base[rng.random(len(base)) < 0.08].copy()
+    revised["publishDate"] += pd.to_timedelta(rng.integers(30, 200, size=len(revised)), unit="D")
+    value_columns = base.columns[5:]
+    revised[value_columns] *= 1 + rng.normal(0, 0.02, size=(len(revised), len(value_columns)))
+
+    reports = pd.concat([base, revised], ignore_index=True)
+    reports = reports[reports["publishDate"] <= pd.Timestamp(end)]
+    reports = reports.sort_values(["publishDate", "ticker"], kind="stable", ignore_index=True)
+    values = reports[value_columns].to_numpy()
+    values[rng.random(values.shape) < 0.02] = np.nan
+    reports[value_columns] = np.round(values, 2)
+    reports.insert(0, "ID", np.arange(1, len(reports) + 1))
+    reports["endDate"] = _iso(reports["endDate"])
+    reports["publishDate"] = _iso(reports["publishDate"])
+
+    keys = ["ID", "ticker", "secID", "endDate", "publishDate", "reportType"]
+    return {
+        "fdmt_is_2018": reports[keys + ["revenue", "NIncome", "TProfit", "operateProfit"]],
+        "fdmt_bs_2018": reports[keys + ["TAssets", "TLiab", "TEquityAttrP"]],
+        "fdmt_cf_2018": reports[keys + ["NCFOperateA", "NCFInvestA", "NCFFrFinanA"]],
+    }
+
+
+def _sec_st(tickers: list, trading_days: pd.DatetimeIndex, rng) -> pd.DataFrame:
+    """约2%的股票在一段连续交易日内为ST"""
+    frames = []
+    for ticker in np.asarray(tickers)[rng.random(len(tickers)) < 0.02]:
+        length = int(rng.integers(60, 250))
+        first = int(rng.integers(0, max(len(trading_days) - length, 1)))
+        days = trading_days[first : first + length]
+        frames.append(
+            pd.DataFrame(
+                {"ticker": ticker, "tradeDate": _iso(days), "STflg": rng.choice(["ST", "*ST"])}
+            )
+        )
+    if not frames:
+        return pd.DataFrame(columns=["ticker", "tradeDate", "STflg"])
+    return pd.concat(frames, ignore_index=True)
+
+
+def _equ_div(tickers: list, trading_days: pd.DatetimeIndex, rng) -> pd.DataFrame:
+    """每年约60%的股票在6、7月除息"""
+    candidates = trading_days[trading_days.month.isin([6, 7])]
+    rows = []
+    for year in sorted(set(candidates.year)):
+        days = candidates[candidates.year == year]
+        for ticker in np.asarray(tickers)[rng.random(len(tickers)) < 0.6]:
+            ex_div = days[int(rng.integers(0, len(days)))]
+            position = trading_days.get_loc(ex_div)
+            rows.append(
+                (
+                    ticker,
+                    ex_div.strftime("%Y-%m-%d"),
+                    trading_days[max(position - 1, 0)].strftime("%Y-%m-%d"),
+                    round(float(rng.uniform(0.05, 1.0)), 3),
+                )
+            )
+    return pd.DataFrame(rows, columns=["ticker", "exDivDate", "recordDate", "perCashDiv"])
+
+
+def _performance_only(n_funds: int, trading_days: pd.DatetimeIndex, rng) -> pd.DataFrame:
+    """产品每日规模, 随机游走"""
+    assets = rng.lognormal(18, 1, size=(n_funds, 1)) * np.exp(
+        np.cumsum(rng.normal(0, 0.01, size=(n_funds, len(trading_days))), axis=1)
+    )
+    return pd.DataFrame(
+        {
+            "fundname": np.repeat([f"产品{i + 1:02d}" for i in range(n_funds)], len(trading_days)),
+            "datadate": np.tile(_iso(trading_days), n_funds),
+            "assets": np.round(assets.ravel(), 2),
+        }
+    )
+
+
+def _stock_daily(mkt_equd: pd.DataFrame) -> pd.DataFrame:
+    """ClickHouse 日行情表, tradingday 为 YYYYMMDD 整数"""
+    df = mkt_equd[mkt_equd["isOpen"] == 1]
+    return pd.DataFrame(
+        {
+            "tradingday": df["tradeDate"].str.replace("-", "").astype(int),
+            "ticker": df["ticker"],
+            "open": df["openPrice"],
+            "high": df["highPrice"],
+            "low": df["lowPrice"],
+            "close": df["closePrice"],
+            "volume": df["turnoverVol"],
+            "amount": df["turnoverValue"],
+        }
+    )
+
+
+_INDEXES = {
+    "trade_cal": ["exchangeCD", "calendarDate"],
+    "mkt_equd": ["ticker", "tradeDate"],
+    "fdmt_is_2018": ["ticker"],
+    "fdmt_bs_2018": ["ticker"],
+    "fdmt_cf_2018": ["ticker"],
+    "sec_st": ["tradeDate"],
+    "equ_div": ["exDivDate"],
+    "performance_only": ["datadate"],
+    "stock_daily": ["tradingday"],
+}
+
+
+def _write_tables(engine, tables: dict):
+    for name, df in tables.items():
+        df.to_sql(name, engine, if_exists="replace", index=False, chunksize=50_000)
+        columns = _INDEXES.get(name)
+        if columns:
+            with engine.begin() as conn:
+                conn.exec_driver_sql(
+                    f"CREATE INDEX IF NOT EXISTS idx_{name} ON {name} ({', '.join(columns)})"
+                )
+
+
+def generate_fixture(
+    path: str,
+    backend: str = "sqlite",
+    n_tickers: int = 300,
+    start=None,
+    end=None,
+    n_funds: int = 20,
+    seed: int = 0,
+    clickhouse_path=None,
+    clickhouse_database: str = "datayes",
+) -> dict:
+    """
+    生成本地测试数据库, 表结构与线上 trade_cal、mkt_equd、fdmt_*、sec_st、equ_div、
+    performance_only 一致, 数据为可复现的随机数据
+
+    参数:
+    path: 数据库文件路径, 已存在的同名表会被覆盖
+    backend: sqlite 或 duckdb
+    n_tickers: 股票数量
+    start: 起始日期 YYYY-MM-DD, 默认为三年前
+    end: 结束日期 YYYY-MM-DD, 默认为今天
+    n_funds: performance_only 中的产品数量
+    seed: 随机数种子
+    clickhouse_path: 可选, ClickHouse 本地文件路径(可含 {database}), 同时生成 stock_daily 表
+    clickhouse_database: ClickHouse 库名
+
+    返回:
+    dict: {表名: 行数}
+    """
+    end = pd.Timestamp(end or date.today())
+    start = pd.Timestamp(start) if start else end - pd.DateOffset(years=3)
+    rng = np.random.default_rng(seed)
+
+    days, is_open = _calendar(pd.Timestamp(start.year - 1, 1, 1), pd.Timestamp(end.year, 12, 31))
+    trading_days = days[is_open]
+    trading_days = trading_days[(trading_days >= start) & (trading_days <= end)]
+    tickers = _tickers(n_tickers)
+
+    mkt_equd = _mkt_equd(tickers, trading_days, rng)
+    tables = {
+        "trade_cal": _trade_cal(days, is_open),
+        "mkt_equd": mkt_equd,
+        **_fundamentals(tickers, start, end, rng),
+        "sec_st": _sec_st(tickers, trading_days, rng),
+        "equ_div": _equ_div(tickers, trading_days, rng),
+        "performance_only": _performance_only(n_funds, trading_days, rng),
+    }
+    _write_tables(Database.create_local_engine(backend, path), tables)
+
+    counts = {name: len(df) for name, df in tables.items()}
+    if clickhouse_path is not None:
+        stock_daily = _stock_daily(mkt_equd)
+        engine = Database.create_local_engine(
+            backend, clickhouse_path.format(database=clickhouse_database)
+        )
+        _write_tables(engine, {"stock_daily": stock_daily})
+        counts["stock_daily"] = len(stock_daily)
+    return counts
+
+
+def write_fixture_config(config_path: str, path: str, backend: str = "sqlite", clickhouse_path=None):
+    """
+    写入指向本地测试库的配置文件, 设置环境变量 PYUTILS_CONFIG 为该路径后生效
+
+    参数:
+    config_path: 配置文件路径
+    path: generate_fixture 生成的数据库文件
+    backend: sqlite 或 duckdb
+    clickhouse_path: 可选, ClickHouse 本地文件路径(可含 {database})
+    """
+    config = {
+        "databases": {
+            server_name: {"backend": backend, "path": os.path.abspath(os.path.expanduser(path))}
+            for server_name in FIXTURE_SERVERS
+        }
+    }
+    if clickhouse_path is not None:
+        config["clickhouse"] = {
+            "backend": backend,
+            "path": os.path.abspath(os.path.expanduser(clickhouse_path)),
+        }
+    with open(config_path, "w", encoding="utf-8") as file:
+        yaml.safe_dump(config, file, allow_unicode=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成本地测试数据库")
+    parser.add_argument("path", help="数据库文件路径")
+    parser.add_argument("--backend", default="sqlite", choices=["sqlite", "duckdb"])
+    parser.add_argument("--tickers", type=int, default=300)
+    parser.add_argument("--start")
+    parser.add_argument("--end")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--clickhouse-path")
+    parser.add_argument("--config", help="同时写入指向该库的配置文件")
+    args = parser.parse_args()
+
+    started = datetime.now()
+    counts = generate_fixture(
+        args.path,
+        backend=args.backend,
+        n_tickers=args.tickers,
+        start=args.start,
+        end=args.end,
+        seed=args.seed,
+        clickhouse_path=args.clickhouse_path,
+    )
+    for name, count in counts.items():
+        print(f"{name}: {count} 行")
+    if args.config:
+        write_fixture_config(args.config, args.path, args.backend, args.clickhouse_path)
+        print(f"配置文件已写入 {args.config}, 设置 PYUTILS_CONFIG={args.config} 后使用")
+    print(f"耗时 {(datetime.now() - started).total_seconds():.1f} 秒")
@@ -0,0 +1,478 @@
+# 因子公式模块
+import ast
+import operator
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from PyUtils import Algorithm, Calendar, Database
+
+
+class _Plan:
+    """公式的取数计划: 按表合并各叶子节点所需的指标"""
+
+    def __init__(self):
+        # 财报表 -> 指标集合
+        self.fundamentals = {}
+        # 行情表 -> {"indicators": 指标集合, "window": 每只股票最多需要的行数}
+        self.market = {}
+        # (行情表, ((列, 运算符, 值), ...)) -> 指标集合
+        self.last_values = {}
+
+    def need_fundamental(self, table, indicator):
+        self.fundamentals.setdefault(table, set()).add(indicator)
+
+    def need_market(self, table, indicator, window):
+        entry = self.market.setdefault(table, {"indicators": set(), "window": 0})
+        entry["indicators"].add(indicator)
+        entry["window"] = max(entry["window"], window)
+
+    def need_last_value(self, table, conditions, indicator):
+        self.last_values.setdefault((table, conditions), set()).add(indicator)
+
+    def summary(self) -> dict:
+        """返回取数计划, 每个键对应一次查询"""
+        return {
+            "fundamentals": {
+                table: sorted(indicators)
+                for table, indicators in self.fundamentals.items()
+            },
+            "market": {
+                table: {
+                    "indicators": sorted(entry["indicators"]),
+                    "window": entry["window"],
+                }
+                for table, entry in self.market.items()
+            },
+            "last_values": {
+                key: sorted(indicators) for key, indicators in self.last_values.items()
+            },
+        }
+
+
+class _Context:
+    """求值上下文: 股票列表及按计划载入的数据"""
+
+    def __init__(self, tickers, server_name):
+        self.tickers = pd.Index([str(ticker) for ticker in tickers], name="ticker")
+        self.server_name = server_name
+        self.today = datetime.now()
+        self.market = {}
+        self.last_values = {}
+
+    def load(self, plan: _Plan):
+        """每张表只查询一次"""
+        tickers = list(self.tickers)
+        for table, indicators in plan.fundamentals.items():
+            Algorithm.FundamentalStore(table, self.server_name).preload(
+                tickers, indicators
+            )
+
+        for table, entry in plan.market.items():
+            columns = ", ".join(sorted(entry["indicators"]))
+            sql = f"""
+            WITH RankedQuotes AS (
+                SELECT
+                    ticker,
+                    tradeDate,
+                    {columns},
+                    ROW_NUMBER() OVER (PARTITION BY ticker ORDER BY tradeDate DESC) AS rn
+                FROM {table}
+                WHERE ticker IN :tickers
+                AND tradeDate <= :today
+            )
+            SELECT *
+            FROM RankedQuotes
+            WHERE rn <= {entry["window"]}
+            """
+            params = {"tickers": tickers, "today": self.today.strftime("%Y-%m-%d")}
+            df = Database.query_pd(self.server_name, sql, params=params)
+            df["ticker"] = df["ticker"].astype(str)
+            df["tradeDate"] = pd.to_datetime(df["tradeDate"])
+            self.market[table] = df
+
+        for (table, conditions), indicators in plan.last_values.items():
+            columns = ", ".join(sorted(indicators))
+            params = {"tickers": tickers}
+            condition_sql = ""
+            for i, (col, op, val) in enumerate(conditions):
+                params[f"v{i}"] = val
+                condition_sql += f" AND {col} {op} :v{i}"
+            sql = f"""
+            WITH Filtered AS (
+                SELECT
+                    ticker,
+                    {columns},
+                    ROW_NUMBER() OVER (PARTITION BY ticker ORDER BY tradeDate DESC) AS rn
+                FROM {table}
+                WHERE ticker IN :tickers{condition_sql}
+            )
+            SELECT *
+            FROM Filtered
+            WHERE rn = 1
+            """
+            df = Database.query_pd(self.server_name, sql, params=params)
+            df["ticker"] = df["ticker"].astype(str)
+            self.last_values[(table, conditions)] = df.set_index("ticker")
+
+    def fundamentals(self, table, indicator, **kwargs) -> pd.DataFrame:
+        return Algorithm.FundamentalStore(table, self.server_name).quarterly_panel(
+            list(self.tickers), [indicator], **kwargs
+        )
+
+    def by_ticker(self, series: pd.Series) -> pd.Series:
+        return series.reindex(self.tickers)
+
+
+class _Node:
+    def register(self, plan: _Plan):
+        pass
+
+    def evaluate(self, context: _Context):
+        raise NotImplementedError
+
+
+class _Constant(_Node):
+    def __init__(self, value):
+        self.value = value
+
+    def evaluate(self, context):
+        return self.value
+
+
+class _Apply(_Node):
+    """对子节点结果调用向量化函数"""
+
+    def __init__(self, func, args):
+        self.func = func
+        self.args = args
+
+    def register(self, plan):
+        for arg in self.args:
+            arg.register(plan)
+
+    def evaluate(self, context):
+        return self.func(*(arg.evaluate(context) for arg in self.args))
+
+
+class _Refq(_Node):
+    def __init__(self, indicator, n, fill_option, table):
+        self.indicator, self.n, self.fill_option, self.table = (
+            indicator,
+            int(n),
+            fill_option,
+            table,
+        )
+
+    def register(self, plan):
+        plan.need_fundamental(self.table, self.indicator)
+
+    def evaluate(self, context):
+        df = context.fundamentals(
+            self.table, self.indicator, end=context.today.strftime("%Y-%m-%d")
+        )
+        df = df.assign(pos=df.groupby("ticker").cumcount())
+        df = df[df["pos"] <= self.n]
+        # 每只股票最近 n+1 期, 列为期序(0为最新)
+        matrix = df.pivot(index="ticker", columns="pos", values=self.indicator).reindex(
+            index=context.tickers, columns=range(self.n + 1)
+        )
+        values = matrix.to_numpy(dtype=object)
+        length = df.groupby("ticker").size().reindex(context.tickers).fillna(0)
+        length = length.to_numpy(dtype=int)
+        rows = np.arange(len(values))
+        last = length - 1
+        result = np.full(len(values), None, dtype=object)
+        has_rows = length > 0
+        result[has_rows] = values[rows[has_rows], last[has_rows]]
+
+        missing = pd.isna(result)
+        if self.fill_option == 0:
+            # 与 refq 一致: 从最后一期起依次往前看, 最多看4期
+            filled = np.full(len(values), None, dtype=object)
+            for i in range(4):
+                col = last - i
+                usable = missing & (col >= 0) & pd.isna(filled)
+                candidate = values[rows[usable], col[usable]]
+                filled[np.flatnonzero(usable)[pd.notna(candidate)]] = candidate[
+                    pd.notna(candidate)
+                ]
+            result = np.where(missing, filled, result)
+        elif self.fill_option == 2:
+            result = np.where(missing, 0, result)
+        else:
+            result = np.where(missing, None, result)
+        return pd.to_numeric(pd.Series(result, index=context.tickers), errors="coerce")
+
+
+class _Stdev(_Node):
+    def __init__(self, indicator, n, table):
+        self.indicator, self.n, self.table = indicator, int(n), table
+
+    def register(self, plan):
+        plan.need_fundamental(self.table, self.indicator)
+
+    def evaluate(self, context):
+        df = context.fundamentals(
+            self.table, self.indicator, end=context.today.strftime("%Y-%m-%d")
+        )
+        df = df[df.groupby("ticker").cumcount() < self.n]
+        values = pd.to_numeric(df[self.indicator], errors="coerce")
+        return context.by_ticker(values.groupby(df["ticker"]).std())
+
+
+class _AccuQ(_Node):
+    def __init__(self, indicator, n, table):
+        self.indicator, self.n, self.table = indicator, int(n), table
+
+    def register(self, plan):
+        plan.need_fundamental(self.table, self.indicator)
+
+    def evaluate(self, context):
+        year = context.today.year - self.n
+        start = datetime(year, 1, 1)
+        end = context.today if self.n == 0 else datetime(year, 12, 31)
+        df = context.fundamentals(self.table, self.indicator, start=start, end=end)
+        latest = df.drop_duplicates("ticker", keep="first").set_index("ticker")
+        return context.by_ticker(pd.to_numeric(latest[self.indicator], errors="coerce"))
+
+
+class _Anual(_Node):
+    table = "fdmt_is_2018"
+
+    def __init__(self, indicator, shift_years):
+        self.indicator, self.shift_years = indicator, int(shift_years)
+
+    def register(self, plan):
+        plan.need_fundamental(self.table, self.indicator)
+
+    def evaluate(self, context):
+        target_year = context.today.year - self.shift_years - 1
+        df = Algorithm.FundamentalStore(
+            self.table, context.server_name
+        ).reports_panel(list(context.tickers), [self.indicator])
+        if df.empty:
+            return pd.Series(np.nan, index=context.tickers)
+        df = df[
+            (df["endDate"] == pd.Timestamp(Calendar.get_last_day_of_year(target_year)))
+            & (df["reportType"] == "A")
+        ]
+        latest = df.sort_values("publishDate", kind="stable").drop_duplicates(
+            "ticker", keep="last"
+        )
+        values = pd.to_numeric(latest.set_index("ticker")[self.indicator], errors="coerce")
+        return context.by_ticker(values)
+
+
+class _MA(_Node):
+    def __init__(self, indicator, n, table):
+        if int(n) <= 0:
+            raise ValueError("公式中的MA窗口必须为正整数")
+        self.indicator, self.n, self.table = indicator, int(n), table
+
+    def register(self, plan):
+        # MA 不含当天, 多取一行以防当天已有数据
+        plan.need_market(self.table, self.indicator, self.n + 1)
+
+    def evaluate(self, context):
+        df = context.market[self.table]
+        df = df[df["tradeDate"] < pd.Timestamp(context.today.date())]
+        # 查询结果无序, 按 rn 排序后取每只股票最近的 n 行
+        df = df.sort_values(["ticker", "rn"], kind="stable")
+        df = df[df.groupby("ticker").cumcount() < self.n]
+        values = pd.to_numeric(df[self.indicator], errors="coerce")
+        return context.by_ticker(values.groupby(df["ticker"]).mean())
+
+
+class _PercentRank(_Node):
+    table = "mkt_equd"
+
+    def __init__(self, indicator, N):
+        self.indicator, self.N = indicator, int(N)
+
+    def register(self, plan):
+        plan.need_market(self.table, self.indicator, self.N + 1)
+
+    def evaluate(self, context):
+        df = context.market[self.table]
+        df = df[df["rn"] <= self.N + 1]
+        return context.by_ticker(
+            Algorithm._percent_rank_latest(df, self.indicator, self.N)
+        )
+
+
+class _LastValue(_Node):
+    def __init__(self, indicator, conditions, table):
+        clauses = []
+        for condition in conditions:
+            col, op, val = condition.split()
+            clauses.append((col, op, float(val)))
+        self.indicator, self.conditions, self.table = indicator, tuple(clauses), table
+
+    def register(self, plan):
+        plan.need_last_value(self.table, self.conditions, self.indicator)
+
+    def evaluate(self, context):
+        df = context.last_values[(self.table, self.conditions)]
+        return context.by_ticker(pd.to_numeric(df[self.indicator], errors="coerce"))
+
+
+# 需要取数的叶子函数, 参数与 Algorithm 中同名函数一致, 但省略 ticker
+_LEAVES = {
+    "refq": _Refq,
+    "Stdev": _Stdev,
+    "AccuQ": _AccuQ,
+    "Anual": _Anual,
+    "MA": _MA,
+    "PercentRank": _PercentRank,
+    "LastValue": _LastValue,
+}
+
+# 纯计算函数, 均支持数组和 Series
+_FUNCTIONS = {
+    "IfNULL": Algorithm.IfNULL,
+    "Power": Algorithm.Power,
+    "abs_value": Algorithm.abs_value,
+    "abs": Algorithm.abs_value,
+    "Not": Algorithm.Not,
+    "And": Algorithm.And,
+    "Or": Algorithm.Or,
+    "Mod": Algorithm.Mod,
+    "Less": Calendar.Less,
+    "Greater": Calendar.Greater,
+}
+
+_BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Mod: Algorithm.Mod,
+    ast.Pow: Algorithm.Power,
+}
+
+_COMPARE_OPS = {
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+}
+
+
+def _literal(node):
+    """叶子函数的参数只允许常量或常量列表"""
+    try:
+        return ast.literal_eval(node)
+    except ValueError:
+        raise ValueError(f"叶子函数参数必须为常量: {ast.unparse(node)}")
+
+
+def _build(node) -> _Node:
+    """将 Python 表达式语法树转换为求值节点"""
+    if isinstance(node, ast.Constant):
+        return _Constant(node.value)
+    if isinstance(node, ast.UnaryOp):
+        operand = _build(node.operand)
+        if isinstance(node.op, ast.USub):
+            return _Apply(operator.neg, [operand])
+        if isinstance(node.op, ast.UAdd):
+            return operand
+        if isinstance(node.op, ast.Not):
+            return _Apply(Algorithm.Not, [operand])
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+        return _Apply(_BINARY_OPS[type(node.op)], [_build(node.left), _build(node.right)])
+    if isinstance(node, ast.BoolOp):
+        func = Algorithm.And if isinstance(node.op, ast.And) else Algorithm.Or
+        return _Apply(func, [_build(value) for value in node.values])
+    if isinstance(node, ast.Compare):
+        operands = [_build(node.left)] + [_build(c) for c in node.comparators]
+        parts = [
+            _Apply(_COMPARE_OPS[type(op)], [operands[i], operands[i + 1]])
+            for i, op in enumerate(node.ops)
+        ]
+        return parts[0] if len(parts) == 1 else _Apply(Algorithm.And, parts)
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+        name = node.func.id
+        if node.keywords:
+            # 参数按位置传入, 关键字参数会被错位或忽略
+            keywords = ", ".join(ast.unparse(keyword) for keyword in node.keywords)
+            raise ValueError(f"函数 {name} 不支持关键字参数: {keywords}")
+        if name in _LEAVES:
+            return _LEAVES[name](*(_literal(arg) for arg in node.args))
+        if name in _FUNCTIONS:
+            return _Apply(_FUNCTIONS[name], [_build(arg) for arg in node.args])
+        raise ValueError(f"不支持的函数: {name}")
+    raise ValueError(f"不支持的表达式: {ast.unparse(node)}")
+
+
+class CompiledFormula:
+    """编译后的因子公式, 同一张表的取数合并为一次查询, 并按全部股票向量化求值"""
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        self._root = _build(ast.parse(expression, mode="eval").body)
+        self._plan = _Plan()
+        self._root.register(self._plan)
+
+    @property
+    def plan(self) -> dict:
+        """取数计划, 每个键对应一次查询"""
+        return self._plan.summary()
+
+    def evaluate(self, tickers: list, server_name="server93Api") -> pd.Series:
+        """
+        对一组股票求值
+
+        参数:
+        tickers: 股票代码列表
+        server_name: 数据库服务器名称,默认为 'server93Api'。
+
+        返回:
+        Series: 以股票代码为索引的公式结果
+        """
+        context = _Context(tickers, server_name)
+        context.load(self._plan)
+        result = self._root.evaluate(context)
+        if isinstance(result, pd.Series):
+            return result.reindex(context.tickers)
+        return pd.Series(result, index=context.tickers)
+
+
+def compile_formula(expression: str) -> CompiledFormula:
+    """
+    编译因子公式
+
+    公式使用 Python 表达式语法, 叶子函数与 Algorithm 中同名函数参数一致但省略 ticker, 例如:
+    Greater(refq("revenue", 1, 0, "fdmt_is_2018"), 0) and MA("closePrice", 20, "mkt_equd") > 10
+
+    参数:
+    expression: 公式字符串
+
+    返回:
+    CompiledFormula: 编译后的公式
+
+    示例:
+    >>> compile_formula('MA("closePrice", 20, "mkt_equd")').plan["market"]
+    {'mkt_equd': {'indicators': ['closePrice'], 'window': 21}}
+    >>> compile_formula('MA("closePrice", n=20, table="mkt_equd")')
+    Traceback (most recent call last):
+    ...
+    ValueError: 函数 MA 不支持关键字参数: n=20, table='mkt_equd'
+    """
+    return CompiledFormula(expression)
+
+
+def evaluate_formula(expression: str, tickers: list, server_name="server93Api") -> pd.Series:
+    """
+    编译并对一组股票求值因子公式
+
+    参数:
+    expression: 公式字符串
+    tickers: 股票代码列表
+    server_name: 数据库服务器名称,默认为 'server93Api'。
+
+    返回:
+    Series: 以股票代码为索引的公式结果
+    """
+    return compile_formula(expression).evaluate(tickers, server_name)
@@ -11,6 +11,7 @@ def performance_product_period(type: Literal["Days", "Year"], period=7):
     - 今年以来日均规模
     """
 
+    params = None
     if type == "Year":
         sql = """
             SELECT fundname, AVG(assets) AS dailyAssets
@@ -24,12 +25,13 @@ def performance_product_period(type: Literal["Days", "Year"], period=7):
         days = period
         res = Calendar.get_period_date(days)
         start_date = res.iloc[0]["calendarDate"]
-        sql = f"""
+        sql = """
             SELECT fundname, AVG(assets) AS dailyAssets
             FROM performance_only
-            WHERE datadate >= '{start_date}'
+            WHERE datadate >= :start_date
             GROUP BY fundname;
         """
+        params = {"start_date": start_date}
 
-    res = Database.query_pd("mysql18", sql)
+    res = Database.query_pd("mysql18", sql, params=params)
     return res